@@ -2,11 +2,20 @@ from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import logging
 import config
-from detector import detector
+from detector import detector, build_stream_url
+from probing import probe_cameras
+from notifications import aggregator
+from profiler import run_profile
+from cluster import NodeAgent
+from model_registry import loaded_models
+from streaming import StreamHub
 import cv2
 import numpy as np
 import threading
 import time
+import hmac
+import math
+import os
 
 # Configure logging
 logging.basicConfig(
@@ -24,9 +33,13 @@ monitoring_thread = None
 monitoring_active = False
 current_settings = None
 
-# Global frame for video feed
-latest_frame = None
-latest_frame_lock = threading.Lock()
+def update_preview_size(max_dim):
+    """Render previews large enough for the biggest stream profile being watched"""
+    detector.preview_pool.max_dim = max(config.PREVIEW_MAX_DIM, max_dim or 0)
+
+# Latest annotated frame and its shared per-profile encodings
+stream_hub = StreamHub(config.STREAM_PROFILES, on_max_dim_change=update_preview_size,
+                       snapshot_ttl=config.SNAPSHOT_DEMAND_TTL)
 
 def monitor_detector():
     """Monitor the detector's heartbeat and restart if necessary"""
@@ -40,8 +53,15 @@ def monitor_detector():
                 # Update detector's heartbeat to show monitoring thread is active
                 detector.heartbeat()
                 
+                # A replayed recording that played to the end is finished, not failed
+                if not detector.is_running and detector.replay_finished:
+                    logger.info("Replay finished, ending detection session")
+                    detection_active = False
+                    clear_latest_frame()
+                    current_settings = None
+                
                 # Check if detector is still running (if detection is marked as active)
-                if not detector.is_running:
+                elif not detector.is_running:
                     logger.error("Detector stopped unexpectedly while session is active")
                     
                     # Attempt to restart the detector with the same settings
@@ -86,7 +106,7 @@ def start_monitoring():
     
     if monitoring_thread is None or not monitoring_thread.is_alive():
         monitoring_active = True
-        monitoring_thread = threading.Thread(target=monitor_detector)
+        monitoring_thread = threading.Thread(target=monitor_detector, name='detector-monitor')
         monitoring_thread.daemon = True
         monitoring_thread.start()
         logger.info("Started detector monitoring thread")
@@ -99,65 +119,105 @@ def stop_monitoring():
 
 def clear_latest_frame():
     """Clear the latest frame"""
-    global latest_frame
-    with latest_frame_lock:
-        latest_frame = None
+    stream_hub.clear()
 
-def generate_frames():
-    """Generate frames for MJPEG streaming"""
-    global latest_frame
-    last_frame_time = time.time()
-    frame_interval = 0.033  # Target ~30 FPS (33ms between frames)
-    
-    while True:
-        # Control frame rate to avoid overwhelming the network
-        current_time = time.time()
-        time_since_last_frame = current_time - last_frame_time
+# Encoded placeholder frames, keyed by message (they never change)
+placeholder_frames = {}
+
+def get_placeholder_frame(text):
+    """Get the encoded JPEG for a blank frame with the given message"""
+    frame_bytes = placeholder_frames.get(text)
+    if frame_bytes is None:
+        # Create blank frame with text
+        blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(blank_frame, text, (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
         
-        if time_since_last_frame < frame_interval:
-            # Sleep just enough time to maintain target frame rate
-            sleep_time = max(0.001, frame_interval - time_since_last_frame)
-            time.sleep(sleep_time)
-            continue
-            
-        last_frame_time = current_time
+        # Encode frame to JPEG with optimized quality
+        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]  # Lower quality for faster transmission
+        _, buffer = cv2.imencode('.jpg', blank_frame, encode_params)
+        frame_bytes = buffer.tobytes()
+        placeholder_frames[text] = frame_bytes
+    return frame_bytes
+
+def generate_frames(profile_name):
+    """Generate frames for MJPEG streaming in the given stream profile"""
+    frame_interval = 1.0 / config.STREAM_PROFILES[profile_name]['fps']
+    last_frame_time = 0
+    last_version = None
+    
+    stream_hub.add_viewer(profile_name)
+    try:
+        while True:
+            # Wait for a new frame, re-sending the current one at least once per keepalive
+            last_version = stream_hub.wait_for_frame(last_version, config.STREAM_KEEPALIVE)
             
-        # If detection is not active or no frame is available, generate blank frame
-        if not detection_active or latest_frame is None:
-            # Create blank frame with text
-            blank_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-            text = "Camera feed not available" if not detection_active else "Waiting for camera feed..."
-            cv2.putText(blank_frame, text, (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            # Control frame rate to avoid overwhelming the network
+            time_since_last_frame = time.time() - last_frame_time
+            if time_since_last_frame < frame_interval:
+                time.sleep(frame_interval - time_since_last_frame)
+            last_frame_time = time.time()
             
-            # Encode frame to JPEG with optimized quality
-            encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]  # Lower quality for faster transmission
-            _, buffer = cv2.imencode('.jpg', blank_frame, encode_params)
-            frame_bytes = buffer.tobytes()
+            # Encoded at most once per frame and profile, shared with all other viewers
+            encoded = stream_hub.get_encoded(profile_name) if detection_active else None
             
+            # If detection is not active or no frame is available, send blank frame
+            if encoded is None:
+                text = "Camera feed not available" if not detection_active else "Waiting for camera feed..."
+                frame_bytes = get_placeholder_frame(text)
+            else:
+                frame_bytes = encoded.data
+                
             yield (b'--frame\r\n'
                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        else:
-            # Acquire lock to access the latest frame
-            with latest_frame_lock:
-                if latest_frame is not None:
-                    # Make a copy to avoid holding the lock during encoding
-                    frame_to_encode = latest_frame.copy()
-                
-            if frame_to_encode is not None:
-                # Encode frame to JPEG with optimized quality
-                encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]  # Lower quality for faster transmission
-                _, buffer = cv2.imencode('.jpg', frame_to_encode, encode_params)
-                frame_bytes = buffer.tobytes()
-                
-                yield (b'--frame\r\n'
-                      b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    finally:
+        stream_hub.remove_viewer(profile_name)
+
+def get_stream_profile():
+    """Get the requested stream profile name, or None if it is unknown"""
+    profile_name = request.args.get('profile', config.DEFAULT_STREAM_PROFILE)
+    return profile_name if profile_name in config.STREAM_PROFILES else None
+
+def unknown_profile_response():
+    return jsonify({
+        'success': False,
+        'message': f"Unknown stream profile. Available profiles: {', '.join(config.STREAM_PROFILES)}"
+    }), 400
 
 @app.route('/video_feed')
 def video_feed():
     """Video streaming route"""
-    return Response(generate_frames(),
+    profile_name = get_stream_profile()
+    if profile_name is None:
+        return unknown_profile_response()
+    return Response(generate_frames(profile_name),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/snapshot')
+def snapshot():
+    """Latest encoded frame as a single JPEG, with ETag support for cheap polling"""
+    profile_name = get_stream_profile()
+    if profile_name is None:
+        return unknown_profile_response()
+    
+    if detection_active:
+        # Polling a profile keeps previews rendered at its size; the first request waits for one
+        stream_hub.request_snapshot(profile_name, timeout=detector.detection_interval + 1.0)
+    
+    encoded = stream_hub.get_encoded(profile_name) if detection_active else None
+    if encoded is None:
+        return jsonify({
+            'success': False,
+            'message': 'No frame available'
+        }), 404
+    
+    if request.if_none_match.contains(encoded.etag):
+        response = Response(status=304)
+    else:
+        response = Response(encoded.data, mimetype='image/jpeg')
+    response.set_etag(encoded.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """API health check endpoint"""
@@ -245,19 +305,69 @@ def start_detection():
             'message': f"Server error: {str(e)}"
         }), 500
 
+@app.route('/configure', methods=['POST'])
+def configure_detection():
+    """Update the running session's settings without restarting the stream"""
+    global current_settings
+    
+    if not detection_active:
+        logger.warning("Attempted to reconfigure detection when not running")
+        return jsonify({
+            'success': False,
+            'message': 'Detection is not running'
+        }), 400
+    
+    try:
+        changes = request.json
+        logger.info(f"Received configure request with settings: {changes}")
+        
+        if not changes:
+            return jsonify({
+                'success': False,
+                'message': 'No settings provided'
+            }), 400
+        
+        if 'ipCameraUrl' in changes and not changes.get('ipCameraUrl'):
+            return jsonify({
+                'success': False,
+                'message': 'Camera URL cannot be empty'
+            }), 400
+        
+        success, message, info = detector.reconfigure(changes, timeout=config.RECONFIGURE_TIMEOUT)
+        
+        if success:
+            # Keep the saved settings in sync so automatic restarts use them
+            current_settings = {**(current_settings or {}), **changes}
+            return jsonify({
+                'success': True,
+                'message': message,
+                **info
+            }), 200
+        else:
+            logger.error(f"Failed to reconfigure detection: {message}")
+            return jsonify({
+                'success': False,
+                'message': message
+            }), 400
+            
+    except Exception as e:
+        logger.exception(f"Error reconfiguring detection: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f"Server error: {str(e)}"
+        }), 500
+
 def update_latest_frame(frame_with_boxes):
     """Callback function to update the latest frame"""
-    global latest_frame
     try:
-        with latest_frame_lock:
-            latest_frame = frame_with_boxes
+        stream_hub.publish(frame_with_boxes, detector.preview_pool.allocated_dim)
     except Exception as e:
         logger.exception(f"Error updating frame: {str(e)}")
 
 @app.route('/stop', methods=['POST'])
 def stop_detection():
     """Stop the object detection process"""
-    global detection_active, latest_frame, current_settings
+    global detection_active, current_settings
     
     if not detection_active:
         logger.warning("Attempted to stop detection when not running")
@@ -273,8 +383,7 @@ def stop_detection():
         if success:
             detection_active = False
             # Clear the latest frame and settings
-            with latest_frame_lock:
-                latest_frame = None
+            clear_latest_frame()
             current_settings = None
             logger.info("Detection stopped successfully")
             return jsonify({
@@ -303,7 +412,23 @@ def get_status():
     """Get current detection status"""
     return jsonify({
         'detection_active': detection_active,
-        'model_loaded': detector.model is not None
+        'replay_finished': detector.replay_finished,
+        'model_loaded': detector.model is not None,
+        'profile': detector.profile.to_dict() if detection_active and detector.profile else None,
+        'loaded_models': loaded_models(),
+        'streams': stream_hub.stats(),
+        'notifications': aggregator.stats(),
+        'cascade': detector.cascade.stats() if detection_active and detector.cascade else None,
+        'last_reconfigure_latency_ms': detector.last_reconfigure_latency * 1000
+            if detector.last_reconfigure_latency is not None else None
+    })
+
+@app.route('/profiles', methods=['GET'])
+def get_profiles():
+    """List the detection profiles that can be selected when starting a session"""
+    return jsonify({
+        'profiles': config.DETECTION_PROFILES,
+        'model_variants': config.MODEL_VARIANTS
     })
 
 @app.route('/test-camera', methods=['POST'])
@@ -335,69 +460,171 @@ def test_camera():
                 'message': 'Camera URL is required'
             }), 400
         
-        # Handle webcam URL format (webcam://0, webcam://1, etc.)
-        if camera_url.startswith('webcam://'):
-            try:
-                # Extract webcam index from URL (default to 0 if not provided or invalid)
-                webcam_index = int(camera_url.replace('webcam://', '') or 0)
-                logger.info(f"Attempting to connect to local webcam with index: {webcam_index}")
-                stream_url = webcam_index
-            except ValueError:
-                logger.error(f"Invalid webcam index: {camera_url.replace('webcam://', '')}")
-                stream_url = 0
-        # Form the full URL based on protocol
-        elif camera_url.startswith(('rtmp://', 'srt://')):
-            # For RTMP and SRT, use the URL as is or append port if specified
-            stream_url = f"{camera_url}:{camera_port}" if camera_port and ':' not in camera_url else camera_url
-        elif not camera_url.startswith(('http://', 'https://')):
-            # For HTTP streams without protocol prefix, add it
-            camera_url = f"http://{camera_url}"
-            stream_url = f"{camera_url}:{camera_port}" if camera_port else camera_url
-        else:
-            # For URLs with protocol already specified
-            stream_url = f"{camera_url}:{camera_port}" if camera_port and ':' not in camera_url else camera_url
-            
+        stream_url = build_stream_url(camera_url, camera_port)
         logger.info(f"Complete stream URL: {stream_url}")
         
-        # Try to open the camera stream
-        import cv2
-        cap = cv2.VideoCapture(stream_url)
+        # Always probe afresh; a successful result is cached for /start
+        result = probe_cameras([stream_url], use_cache=False)[0]
         
-        if cap.isOpened():
-            # Read a frame to confirm it's working
-            ret, frame = cap.read()
-            cap.release()
+        if result['success']:
+            logger.info("Camera connection successful")
+            return jsonify(result), 200
+        else:
+            logger.error(f"Camera test failed: {result['message']}")
+            return jsonify(result), 400
             
-            if ret:
-                logger.info("Camera connection successful")
-                return jsonify({
-                    'success': True,
-                    'message': 'Camera connection successful'
-                }), 200
-            else:
-                logger.error("Connected to camera but failed to read frame")
+    except Exception as e:
+        logger.error(f"Error testing camera: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f"Error: {str(e)}"
+        }), 500
+
+@app.route('/probe-cameras', methods=['POST'])
+def probe_cameras_route():
+    """Test many camera connections concurrently and report their stream metadata"""
+    try:
+        data = request.json
+        cameras = data.get('cameras') if isinstance(data, dict) else None
+        
+        if not cameras or not isinstance(cameras, list):
+            logger.error("No cameras provided in probe-cameras request")
+            return jsonify({
+                'success': False,
+                'message': 'A list of cameras is required'
+            }), 400
+        
+        if any(not isinstance(camera, dict) or not isinstance(camera.get('url'), str) or not camera['url']
+               for camera in cameras):
+            return jsonify({
+                'success': False,
+                'message': 'Every camera must be an object with a url'
+            }), 400
+        
+        timeout = data.get('timeout')
+        if timeout is not None:
+            try:
+                timeout = float(timeout)
+            except (ValueError, TypeError):
+                timeout = None
+            if timeout is None or not math.isfinite(timeout) or timeout <= 0:
                 return jsonify({
                     'success': False,
-                    'message': 'Connected to camera but failed to read frame'
+                    'message': 'Timeout must be a positive number of seconds'
                 }), 400
-        else:
-            logger.error(f"Failed to connect to camera at {stream_url}")
+        
+        stream_urls = [build_stream_url(camera['url'], camera.get('port', '')) for camera in cameras]
+        logger.info(f"Probing {len(stream_urls)} cameras")
+        
+        start_time = time.time()
+        results = probe_cameras(stream_urls, timeout=timeout, use_cache=not data.get('refresh', False))
+        for camera, result in zip(cameras, results):
+            result['url'] = camera['url']
+            result['port'] = camera.get('port', '')
+        
+        return jsonify({
+            'success': True,
+            'reachable': sum(1 for result in results if result['success']),
+            'elapsed_ms': (time.time() - start_time) * 1000,
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        logger.error(f"Error probing cameras: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f"Error: {str(e)}"
+        }), 500
+
+def is_admin_request():
+    """Check the request's admin token (Authorization: Bearer or X-Admin-Token)"""
+    if not config.ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        token = auth_header[len('Bearer '):]
+    return hmac.compare_digest(token.encode('utf-8'), config.ADMIN_TOKEN.encode('utf-8'))
+
+@app.route('/admin/profile', methods=['POST'])
+def profile_process():
+    """Sample the running process's threads and download the profile"""
+    if not is_admin_request():
+        logger.warning("Rejected unauthenticated profile request")
+        return jsonify({
+            'success': False,
+            'message': 'Admin token required' if config.ADMIN_TOKEN else 'Admin endpoints are disabled'
+        }), 403
+    
+    try:
+        duration = float(request.args.get('duration', 10))
+        interval = float(request.args.get('interval', 0.01))
+        top = int(request.args.get('top', 20))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'duration, interval and top must be numbers'
+        }), 400
+    output_format = request.args.get('format', 'collapsed')
+    allocations = request.args.get('allocations', '').lower() in ('true', '1', 't')
+    
+    # Allocation tracing slows the whole process, so it gets a shorter cap
+    max_duration = config.PROFILE_MAX_ALLOCATION_DURATION if allocations else config.PROFILE_MAX_DURATION
+    if not 0 < duration <= max_duration:
+        return jsonify({
+            'success': False,
+            'message': f'Duration must be between 0 and {max_duration} seconds'
+                       f"{' when tracing allocations' if allocations else ''}"
+        }), 400
+    if not 0.001 <= interval <= 1:
+        return jsonify({
+            'success': False,
+            'message': 'Interval must be between 0.001 and 1 seconds'
+        }), 400
+    if output_format not in ('collapsed', 'pstats'):
+        return jsonify({
+            'success': False,
+            'message': "Format must be 'collapsed' or 'pstats'"
+        }), 400
+    
+    try:
+        result = run_profile(duration, interval, output_format, top, allocations)
+        if result is None:
             return jsonify({
                 'success': False,
-                'message': f'Failed to connect to camera at {stream_url}'
-            }), 400
-            
+                'message': 'A profile is already running'
+            }), 409
+        
+        filename, data = result
+        return Response(data, mimetype='application/zip',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
     except Exception as e:
-        logger.error(f"Error testing camera: {str(e)}")
+        logger.exception(f"Error profiling process: {str(e)}")
         return jsonify({
             'success': False,
-            'message': f"Error: {str(e)}"
+            'message': f"Server error: {str(e)}"
         }), 500
 
+def cluster_status():
+    """Session status reported to the coordinator with each heartbeat"""
+    return {
+        'detection_active': detection_active,
+        'camera_id': current_settings.get('cameraId') if detection_active and current_settings else None,
+        # Lets the coordinator retire a replayed camera instead of starting it again elsewhere
+        'finished_camera_id': detector.settings.get('cameraId')
+            if detector.replay_finished and not detection_active else None
+    }
+
 if __name__ == '__main__':
     # Preload the model
     detector.load_model()
     
+    # Join the cluster when a coordinator is configured (only from the serving process
+    # when the debug reloader is active)
+    if config.COORDINATOR_URL and (not config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        NodeAgent(config.COORDINATOR_URL, config.NODE_URL, config.NODE_ID,
+                  status_callback=cluster_status).start()
+    
     # Start the Flask server
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,185 @@
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from frame_buffers import PreviewBufferPool, draw_detections
+from streaming import StreamHub
+
+# Source resolutions exercised by the benchmark
+RESOLUTIONS = {
+    '720p': (720, 1280),
+    '1080p': (1080, 1920),
+    '4k': (2160, 3840),
+}
+
+# Pipeline stages, in the order a frame passes through them
+STAGES = ('decode', 'preview', 'stream')
+
+
+def make_detections(h, w, count=8):
+    """Create synthetic detections spread across a frame"""
+    detections = []
+    for i in range(count):
+        x1 = (i * w) // (count + 1)
+        y1 = (i * h) // (count + 1)
+        detections.append({
+            'class': 'person' if i % 2 == 0 else 'car',
+            'confidence': 0.5 + i / (count * 4),
+            'box': [float(x1), float(y1), float(x1 + w // 10), float(y1 + h // 8)]
+        })
+    return detections
+
+
+def write_clip(path, count, h, w):
+    """Write a synthetic MJPEG clip of `count` frames for the capture stage to decode"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (w, h))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open a video writer for {path}")
+    gradient = np.linspace(0, 255, w, dtype=np.uint8)[np.newaxis, :, np.newaxis]
+    base = np.repeat(np.repeat(gradient, h, axis=0), 3, axis=2)
+    for i in range(count):
+        # A moving block keeps consecutive frames different
+        frame = base.copy()
+        x = (i * w // 40) % (w - w // 8)
+        frame[h // 4:h // 2, x:x + w // 8] = (0, 0, 255)
+        writer.write(frame)
+    writer.release()
+
+
+class LegacyPipeline:
+    """Previous pipeline: cap.read() into a new frame, a full-resolution copy to annotate
+    and resize, and a copy plus JPEG encode per viewer per tick"""
+
+    def __init__(self, clip, max_dim, viewers):
+        self.cap = cv2.VideoCapture(clip)
+        self.max_dim = max_dim
+        self.viewers = viewers
+
+    def decode(self, _):
+        ret, frame = self.cap.read()
+        if not ret:
+            raise RuntimeError("Clip ended before the benchmark did")
+        return frame
+
+    def preview(self, frame, detections):
+        frame_with_boxes = frame.copy()
+        draw_detections(frame_with_boxes, detections)
+        h, w = frame_with_boxes.shape[:2]
+        if max(h, w) > self.max_dim:
+            scale = self.max_dim / max(h, w)
+            frame_with_boxes = cv2.resize(frame_with_boxes, (int(w * scale), int(h * scale)),
+                                          interpolation=cv2.INTER_AREA)
+        return frame_with_boxes
+
+    def stream(self, preview):
+        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
+        for _ in range(self.viewers):
+            frame_to_encode = preview.copy()
+            _, buffer = cv2.imencode('.jpg', frame_to_encode, encode_params)
+            buffer.tobytes()
+
+    def release(self):
+        self.cap.release()
+
+
+class PooledPipeline:
+    """Current pipeline: cap.read() into the previous frame's buffer, resize into a pooled
+    preview buffer and encode once per frame for all viewers of a profile"""
+
+    def __init__(self, clip, max_dim, viewers):
+        self.cap = cv2.VideoCapture(clip)
+        self.viewers = viewers
+        self.capture_buffer = None
+        self.pool = PreviewBufferPool(max_dim)
+        self.hub = StreamHub({'sd': {'max_dim': max_dim, 'quality': 80, 'fps': 30}})
+
+    def decode(self, _):
+        # Same as the detection loop: decode into the previous frame's buffer
+        if self.capture_buffer is not None:
+            ret, frame = self.cap.read(self.capture_buffer)
+        else:
+            ret, frame = self.cap.read()
+        if not ret:
+            raise RuntimeError("Clip ended before the benchmark did")
+        self.capture_buffer = frame
+        return frame
+
+    def preview(self, frame, detections):
+        return self.pool.render(frame, detections)
+
+    def stream(self, preview):
+        self.hub.publish(preview)
+        for _ in range(self.viewers):
+            self.hub.get_encoded('sd')
+
+    def release(self):
+        self.cap.release()
+
+
+def measure(pipeline, count, detections):
+    """Return ({stage: bytes allocated per frame}, milliseconds per frame) for a pipeline.
+
+    Allocation of a stage is the tracemalloc high-water mark above the live
+    baseline while the stage runs, averaged over `count` frames read from the
+    pipeline's clip.
+    """
+    def run(record=None):
+        value = None
+        for stage in STAGES:
+            if record is not None:
+                baseline, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            if stage == 'preview':
+                value = pipeline.preview(value, detections)
+            else:
+                value = getattr(pipeline, stage)(value)
+            if record is not None:
+                _, peak = tracemalloc.get_traced_memory()
+                record[stage] += peak - baseline
+
+    run()  # Warm up so one-off allocations are not counted
+
+    allocated = dict.fromkeys(STAGES, 0)
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for _ in range(count):
+        run(allocated)
+    elapsed = time.perf_counter() - start_time
+    tracemalloc.stop()
+    return {stage: total / count for stage, total in allocated.items()}, elapsed * 1000 / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-frame allocation of the capture, preview and stream pipeline')
+    parser.add_argument('--frames', type=int, default=50, help='Frames processed per resolution')
+    parser.add_argument('--max-dim', type=int, default=480, help='Preview size (longest side)')
+    parser.add_argument('--viewers', type=int, default=3, help='Stream viewers served per frame')
+    parser.add_argument('--resolution', choices=sorted(RESOLUTIONS), action='append',
+                        help='Resolutions to test (default: all)')
+    args = parser.parse_args()
+
+    header = ''.join(f"{stage + ' KB':>12}" for stage in STAGES)
+    print(f"{'resolution':<10} {'pipeline':<8}{header} {'total KB':>11} {'ms/frame':>9}")
+    for name in args.resolution or RESOLUTIONS:
+        h, w = RESOLUTIONS[name]
+        detections = make_detections(h, w)
+        with tempfile.TemporaryDirectory() as tmp:
+            clip = os.path.join(tmp, f"{name}.avi")
+            # One extra frame for the warm-up run
+            write_clip(clip, args.frames + 1, h, w)
+
+            for label, pipeline_class in (('legacy', LegacyPipeline), ('pooled', PooledPipeline)):
+                pipeline = pipeline_class(clip, args.max_dim, args.viewers)
+                try:
+                    allocated, ms = measure(pipeline, args.frames, detections)
+                finally:
+                    pipeline.release()
+                columns = ''.join(f"{allocated[stage] / 1024:>12.1f}" for stage in STAGES)
+                print(f"{name:<10} {label:<8}{columns} {sum(allocated.values()) / 1024:>11.1f} {ms:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger('cascade')
+
+
+class CascadeInference:
+    """Two-stage detection: a small screener on every frame, the full model only when needed.
+
+    The screener reports candidates down to `escalate_low`. A frame is escalated
+    to the verifier when any candidate is in the uncertain band
+    [escalate_low, escalate_high) or belongs to one of `escalate_classes`.
+    Frames with no candidates, or only confident ones, keep the screener's
+    detections above the profile's confidence threshold. Every
+    `audit_interval`-th frame that was not escalated is verified anyway so the
+    agreement between both stages (and any recall loss) can be measured.
+    Agreement and recall loss only count audited frames, since escalated
+    frames return the verifier's detections; escalated frames are reported
+    separately as corrections made by the verifier.
+    """
+
+    def __init__(self, screener, verifier, screener_kwargs, verifier_kwargs, confidence,
+                 escalate_low, escalate_high, escalate_classes=None, audit_interval=0):
+        self.screener = screener
+        self.verifier = verifier
+        self.screener_kwargs = dict(screener_kwargs, conf=escalate_low)
+        self.verifier_kwargs = verifier_kwargs
+        self.confidence = confidence
+        self.escalate_low = escalate_low
+        self.escalate_high = escalate_high
+        self.escalate_classes = {name.lower() for name in escalate_classes or []}
+        self.audit_interval = int(audit_interval or 0)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.frames = 0
+            self.escalated = 0
+            self.audited = 0
+            self.agreements = 0  # Audited frames where both stages found the same classes
+            self.missed_classes = 0  # Classes only the verifier found on audited frames (screener recall loss)
+            self.extra_classes = 0  # Classes only the screener found on audited frames
+            self.escalated_agreements = 0
+            self.corrected_classes = 0  # Classes the verifier added or removed on escalated frames
+            self.screener_time = 0.0
+            self.verifier_time = 0.0
+            self.skipped_since_audit = 0
+
+    def should_escalate(self, candidates):
+        """Whether the screener's candidates need the verifier"""
+        for candidate in candidates:
+            if candidate['confidence'] < self.escalate_high:
+                return True
+            if candidate['class'].lower() in self.escalate_classes:
+                return True
+        return False
+
+    def detect(self, frame):
+        """Run the cascade on a frame and return the final detections"""
+        start_time = time.time()
+        candidates = self.screener.detect(frame, **self.screener_kwargs)
+        screener_time = time.time() - start_time
+        screened = [d for d in candidates if d['confidence'] >= self.confidence]
+
+        escalate = self.should_escalate(candidates)
+        audit = False
+        if not escalate and self.audit_interval:
+            self.skipped_since_audit += 1
+            if self.skipped_since_audit >= self.audit_interval:
+                audit = True
+                self.skipped_since_audit = 0
+
+        verifier_time = 0.0
+        verified = None
+        if escalate or audit:
+            start_time = time.time()
+            verified = self.verifier.detect(frame, **self.verifier_kwargs)
+            verifier_time = time.time() - start_time
+
+        with self.lock:
+            self.frames += 1
+            self.screener_time += screener_time
+            self.verifier_time += verifier_time
+            if escalate:
+                self.escalated += 1
+            if audit:
+                self.audited += 1
+            if verified is not None:
+                screened_classes = {d['class'] for d in screened}
+                verified_classes = {d['class'] for d in verified}
+                if escalate:
+                    if screened_classes == verified_classes:
+                        self.escalated_agreements += 1
+                    self.corrected_classes += len(verified_classes ^ screened_classes)
+                else:
+                    if screened_classes == verified_classes:
+                        self.agreements += 1
+                    self.missed_classes += len(verified_classes - screened_classes)
+                    self.extra_classes += len(screened_classes - verified_classes)
+
+        return verified if verified is not None else screened
+
+    def stats(self):
+        """Escalation rate, stage agreement on audited frames and estimated verifier time saved"""
+        with self.lock:
+            verified = self.escalated + self.audited
+            avg_verifier_time = self.verifier_time / verified if verified else None
+            skipped = self.frames - verified
+            return {
+                'frames': self.frames,
+                'escalated': self.escalated,
+                'escalation_rate': self.escalated / self.frames if self.frames else None,
+                'audited': self.audited,
+                'agreement_rate': self.agreements / self.audited if self.audited else None,
+                'missed_classes': self.missed_classes,
+                'extra_classes': self.extra_classes,
+                'escalated_agreement_rate': self.escalated_agreements / self.escalated if self.escalated else None,
+                'escalated_corrected_classes': self.corrected_classes,
+                'avg_screener_ms': self.screener_time * 1000 / self.frames if self.frames else None,
+                'avg_verifier_ms': avg_verifier_time * 1000 if avg_verifier_time is not None else None,
+                'verifier_runs_skipped': skipped,
+                'estimated_time_saved_s': skipped * avg_verifier_time - self.screener_time
+                    if avg_verifier_time is not None else None,
+            }
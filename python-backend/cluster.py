@@ -0,0 +1,82 @@
+import os
+import socket
+import threading
+import time
+import logging
+import requests
+import config
+
+logger = logging.getLogger('cluster')
+
+# A backend process runs a single detector, so it can serve one camera session
+NODE_CAPACITY = 1
+
+
+class NodeAgent:
+    """Registers this backend with the coordinator and keeps it informed with heartbeats.
+
+    Each heartbeat reports the node's capacity, its CPU load since the previous
+    heartbeat (process CPU time per core, 0-1) and the camera it is running.
+    """
+
+    def __init__(self, coordinator_url, node_url, node_id=None, status_callback=None):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.node_url = node_url.rstrip('/')
+        self.node_id = node_id or f"{socket.gethostname()}:{config.FLASK_PORT}"
+        self.capacity = NODE_CAPACITY
+        self.status_callback = status_callback
+        self.active = False
+        self.thread = None
+        self._last_cpu = time.process_time()
+        self._last_time = time.time()
+
+    def measure_load(self):
+        """Fraction of the machine's cores this process used since the last call"""
+        now, cpu = time.time(), time.process_time()
+        elapsed = now - self._last_time
+        load = (cpu - self._last_cpu) / (elapsed * (os.cpu_count() or 1)) if elapsed > 0 else 0.0
+        self._last_time, self._last_cpu = now, cpu
+        return min(1.0, load)
+
+    def payload(self):
+        payload = {
+            'node_id': self.node_id,
+            'url': self.node_url,
+            'capacity': self.capacity,
+            'load': self.measure_load(),
+        }
+        if self.status_callback:
+            payload.update(self.status_callback())
+        return payload
+
+    def start(self):
+        self.active = True
+        self.thread = threading.Thread(target=self.run, name='cluster-heartbeat')
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Cluster node {self.node_id} reporting to {self.coordinator_url}")
+
+    def stop(self):
+        self.active = False
+
+    def run(self):
+        registered = False
+        while self.active:
+            try:
+                endpoint = 'heartbeat' if registered else 'register'
+                response = requests.post(f"{self.coordinator_url}/nodes/{endpoint}",
+                                         json=self.payload(), timeout=5)
+                if response.status_code == 200:
+                    if not registered:
+                        logger.info(f"Registered with coordinator as {self.node_id}")
+                    registered = True
+                elif response.status_code == 404:
+                    # The coordinator restarted or declared this node dead: register again
+                    logger.warning("Coordinator does not know this node, registering again")
+                    registered = False
+                else:
+                    logger.error(f"Coordinator {endpoint} failed: {response.status_code} - {response.text}")
+            except Exception as e:
+                logger.error(f"Error contacting coordinator: {str(e)}")
+                registered = False
+            time.sleep(config.NODE_HEARTBEAT_INTERVAL)
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -11,14 +12,140 @@ DEBUG = os.getenv('DEBUG', 'True').lower() in ('true', '1', 't')
 # Model Configuration
 MODEL_PATH = os.getenv('MODEL_PATH', 'yolo11m.pt')
 
+# Model files for each selectable variant (n/s/m)
+MODEL_VARIANTS = {
+    'n': os.getenv('MODEL_PATH_N', 'yolo11n.pt'),
+    's': os.getenv('MODEL_PATH_S', 'yolo11s.pt'),
+    'm': os.getenv('MODEL_PATH_M', MODEL_PATH),
+}
+
 # Confidence threshold for detections (0-1)
 CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', 0.5))
 
+# IoU threshold used by non-maximum suppression (0-1)
+IOU_THRESHOLD = float(os.getenv('IOU_THRESHOLD', 0.45))
+
+# Default model input size in pixels
+INPUT_SIZE = int(os.getenv('INPUT_SIZE', 640))
+
+# Cascade defaults: screener candidates with confidence in [LOW, HIGH) are verified by the full model
+CASCADE_ESCALATE_LOW = float(os.getenv('CASCADE_ESCALATE_LOW', 0.25))
+CASCADE_ESCALATE_HIGH = float(os.getenv('CASCADE_ESCALATE_HIGH', 0.6))
+# Every Nth non-escalated frame is verified anyway to measure agreement (0 disables)
+CASCADE_AUDIT_INTERVAL = int(os.getenv('CASCADE_AUDIT_INTERVAL', 20))
+
+# Detection profiles selectable per camera with the `detectionProfile` start setting.
+# `classes` is an allow-list of class names applied inside NMS (None keeps every class).
+# `cascade` (optional) screens every frame with a smaller model and only runs `model` when needed.
+DETECTION_PROFILES = {
+    'default': {
+        'model': 'm',
+        'input_size': INPUT_SIZE,
+        'confidence': CONFIDENCE_THRESHOLD,
+        'iou': IOU_THRESHOLD,
+        'classes': None,
+    },
+    'people': {
+        'model': 's',
+        'input_size': INPUT_SIZE,
+        'confidence': CONFIDENCE_THRESHOLD,
+        'iou': IOU_THRESHOLD,
+        'classes': ['person'],
+    },
+    'people-vehicles': {
+        'model': 'm',
+        'input_size': INPUT_SIZE,
+        'confidence': CONFIDENCE_THRESHOLD,
+        'iou': IOU_THRESHOLD,
+        'classes': ['person', 'bicycle', 'car', 'motorcycle', 'bus', 'truck'],
+    },
+    'cascade': {
+        'model': 'm',
+        'input_size': INPUT_SIZE,
+        'confidence': CONFIDENCE_THRESHOLD,
+        'iou': IOU_THRESHOLD,
+        'classes': ['person', 'bicycle', 'car', 'motorcycle', 'bus', 'truck'],
+        'cascade': {'screener': 'n', 'escalate_classes': []},
+    },
+    'lightweight': {
+        'model': 'n',
+        'input_size': 416,
+        'confidence': CONFIDENCE_THRESHOLD,
+        'iou': IOU_THRESHOLD,
+        'classes': ['person', 'bicycle', 'car', 'motorcycle', 'bus', 'truck'],
+    },
+}
+
+# Optional JSON file with extra or overriding detection profiles
+DETECTION_PROFILES_FILE = os.getenv('DETECTION_PROFILES_FILE')
+if DETECTION_PROFILES_FILE and os.path.exists(DETECTION_PROFILES_FILE):
+    with open(DETECTION_PROFILES_FILE) as f:
+        DETECTION_PROFILES.update(json.load(f))
+
 # Video stream buffer size
 STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', 10))
 
 # Detection interval (in seconds)
 DETECTION_INTERVAL = float(os.getenv('DETECTION_INTERVAL', 1.0))
 
+# Camera probing: per-probe deadline, concurrent probes and how long results are reused
+PROBE_TIMEOUT = float(os.getenv('PROBE_TIMEOUT', 10.0))
+PROBE_MAX_WORKERS = int(os.getenv('PROBE_MAX_WORKERS', 16))
+PROBE_CACHE_TTL = float(os.getenv('PROBE_CACHE_TTL', 300.0))
+
+# Open/read timeout passed to OpenCV capture backends that support it (seconds)
+CAPTURE_TIMEOUT = float(os.getenv('CAPTURE_TIMEOUT', 10.0))
+
+# Token required by admin endpoints such as /admin/profile (unset disables them)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+# Upper bound on an on-demand profile's duration (seconds)
+PROFILE_MAX_DURATION = float(os.getenv('PROFILE_MAX_DURATION', 60.0))
+# Upper bound when the profile also traces allocations (?allocations=1), which slows every allocation
+PROFILE_MAX_ALLOCATION_DURATION = float(os.getenv('PROFILE_MAX_ALLOCATION_DURATION', 10.0))
+
+# Cluster configuration: a node registers with COORDINATOR_URL when it is set
+COORDINATOR_URL = os.getenv('COORDINATOR_URL')
+COORDINATOR_PORT = int(os.getenv('COORDINATOR_PORT', 6000))
+NODE_ID = os.getenv('NODE_ID')  # Defaults to <hostname>:<FLASK_PORT>
+NODE_URL = os.getenv('NODE_URL', f"http://127.0.0.1:{FLASK_PORT}")
+NODE_HEARTBEAT_INTERVAL = float(os.getenv('NODE_HEARTBEAT_INTERVAL', 3.0))
+# Seconds without a heartbeat after which a node is considered dead
+NODE_TIMEOUT = float(os.getenv('NODE_TIMEOUT', 10.0))
+# Nodes reporting a higher CPU load (0-1) are skipped when assigning cameras
+NODE_LOAD_LIMIT = float(os.getenv('NODE_LOAD_LIMIT', 0.9))
+# Virtual nodes per backend node on the consistent hash ring
+HASH_RING_REPLICAS = int(os.getenv('HASH_RING_REPLICAS', 64))
+
+# Seconds /configure waits for the detection loop to apply new settings
+RECONFIGURE_TIMEOUT = float(os.getenv('RECONFIGURE_TIMEOUT', 5.0))
+
 # NTFY Configuration
-NTFY_BASE_URL = os.getenv('NTFY_BASE_URL', 'https://ntfy.sh') 
\ No newline at end of file
+NTFY_BASE_URL = os.getenv('NTFY_BASE_URL', 'https://ntfy.sh')
+
+# Seconds detections are merged into one digest per topic (0 sends every notification on its own)
+NOTIFICATION_WINDOW = float(os.getenv('NOTIFICATION_WINDOW', 5.0))
+# Minimum seconds between digests sent to the same topic (urgent person alerts are exempt)
+NOTIFICATION_MIN_INTERVAL = float(os.getenv('NOTIFICATION_MIN_INTERVAL', 10.0)) 
+
+# Preview stream configuration
+PREVIEW_MAX_DIM = int(os.getenv('PREVIEW_MAX_DIM', 480))
+# Number of preallocated preview buffers kept per camera
+PREVIEW_BUFFER_DEPTH = int(os.getenv('PREVIEW_BUFFER_DEPTH', 3))
+
+# Stream profiles selectable with /video_feed?profile=... and /snapshot?profile=...
+# max_dim is the longest side in pixels, quality the JPEG quality and fps the maximum frame rate
+STREAM_PROFILES = {
+    'thumbnail': {'max_dim': 240, 'quality': 60, 'fps': 5},
+    'sd': {'max_dim': PREVIEW_MAX_DIM, 'quality': 80, 'fps': 30},
+    'full': {'max_dim': int(os.getenv('FULL_STREAM_MAX_DIM', 1920)), 'quality': 90, 'fps': 30},
+}
+DEFAULT_STREAM_PROFILE = os.getenv('DEFAULT_STREAM_PROFILE', 'sd')
+
+# Seconds a snapshot request keeps previews rendered at its profile's size
+SNAPSHOT_DEMAND_TTL = float(os.getenv('SNAPSHOT_DEMAND_TTL', 30.0))
+
+# Seconds after which an unchanged frame is re-sent to keep MJPEG connections alive
+STREAM_KEEPALIVE = float(os.getenv('STREAM_KEEPALIVE', 1.0))
+
+# Frame rate assumed when replaying a frame directory (or a video without fps metadata)
+REPLAY_FPS = float(os.getenv('REPLAY_FPS', 10))
@@ -0,0 +1,449 @@
+import bisect
+import hashlib
+import threading
+import time
+import logging
+from urllib.parse import urlencode
+import requests
+from flask import Flask, request, jsonify, Response, redirect, stream_with_context
+from flask_cors import CORS
+import config
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('coordinator')
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self.points = []
+        self.owners = []
+
+    @staticmethod
+    def _hash(key):
+        # Stable across processes, unlike hash()
+        return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+    def rebuild(self, node_ids):
+        ring = sorted((self._hash(f"{node_id}#{i}"), node_id) for node_id in node_ids for i in range(self.replicas))
+        self.points = [point for point, _ in ring]
+        self.owners = [node_id for _, node_id in ring]
+
+    def candidates(self, key):
+        """Node ids in ring order starting at the key's position, each once"""
+        if not self.points:
+            return []
+        start = bisect.bisect(self.points, self._hash(key))
+        seen = []
+        for i in range(len(self.owners)):
+            node_id = self.owners[(start + i) % len(self.owners)]
+            if node_id not in seen:
+                seen.append(node_id)
+        return seen
+
+
+class Coordinator:
+    """Assigns camera sessions to backend nodes and moves them when a node dies.
+
+    A camera goes to the first node on the hash ring, starting from the
+    camera id, that has free capacity and reports a load below
+    NODE_LOAD_LIMIT. If every node with capacity is over the limit, the first
+    one with capacity is used.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.nodes = {}
+        self.cameras = {}
+        self.ring = HashRing(config.HASH_RING_REPLICAS)
+        self.monitor_thread = None
+
+    def _rebuild_ring(self):
+        self.ring.rebuild([node_id for node_id, node in self.nodes.items() if node['alive']])
+
+    def _sessions(self, node_id):
+        return sum(1 for camera in self.cameras.values() if camera['node_id'] == node_id)
+
+    def register_node(self, payload):
+        """Add (or re-add) a node; cameras it owned before a restart are started again"""
+        node_id = payload['node_id']
+        with self.lock:
+            previous = self.nodes.get(node_id)
+            self.nodes[node_id] = {
+                'node_id': node_id,
+                'url': payload['url'].rstrip('/'),
+                'capacity': int(payload.get('capacity', 1)),
+                'load': float(payload.get('load', 0.0)),
+                'detection_active': payload.get('detection_active', False),
+                'camera_id': payload.get('camera_id'),
+                'finished_camera_id': payload.get('finished_camera_id'),
+                'last_seen': time.time(),
+                'alive': True,
+            }
+            self._rebuild_ring()
+            # A restarted node has lost its process-local sessions
+            orphaned = [camera_id for camera_id, camera in self.cameras.items()
+                        if camera['node_id'] == node_id and payload.get('camera_id') != camera_id]
+            for camera_id in orphaned:
+                self.cameras[camera_id]['node_id'] = None
+            # A node that was declared dead may still run a camera that has moved elsewhere
+            running = self.cameras.get(payload.get('camera_id'))
+            stale = payload.get('camera_id') is not None and (running is None or running['node_id'] != node_id)
+        logger.info(f"Node {node_id} registered at {payload['url']} "
+                    f"({'re-registered' if previous else 'new'}, capacity {payload.get('capacity', 1)})")
+        if stale:
+            logger.warning(f"Stopping camera {payload['camera_id']} on node {node_id}, it is owned elsewhere")
+            try:
+                requests.post(f"{payload['url'].rstrip('/')}/stop", timeout=10)
+            except Exception as e:
+                logger.error(f"Error stopping stale session on node {node_id}: {str(e)}")
+        for camera_id in orphaned:
+            self.assign_camera(camera_id)
+
+    def heartbeat(self, payload):
+        """Update a node's load and status; returns False if the node must register again"""
+        with self.lock:
+            node = self.nodes.get(payload.get('node_id'))
+            if node is None or not node['alive']:
+                return False
+            node.update({
+                'load': float(payload.get('load', node['load'])),
+                'detection_active': payload.get('detection_active', False),
+                'camera_id': payload.get('camera_id'),
+                'finished_camera_id': payload.get('finished_camera_id'),
+                'last_seen': time.time(),
+            })
+            return True
+
+    def assign_camera(self, camera_id, settings=None):
+        """Start a camera on the best node; returns (success, message, node_id)"""
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            if settings is None:
+                if camera is None:
+                    return False, f"Unknown camera: {camera_id}", None
+                settings = camera['settings']
+            candidates = self.ring.candidates(camera_id)
+            with_capacity = [node_id for node_id in candidates
+                             if self._sessions(node_id) < self.nodes[node_id]['capacity']]
+            under_limit = [node_id for node_id in with_capacity
+                           if self.nodes[node_id]['load'] < config.NODE_LOAD_LIMIT]
+            order = under_limit + [node_id for node_id in with_capacity if node_id not in under_limit]
+            if camera is not None and camera.get('assigning'):
+                return False, "Camera is already being assigned", None
+            # Mark the camera so the monitor does not assign it concurrently
+            self.cameras[camera_id] = {
+                'camera_id': camera_id,
+                'settings': settings,
+                'node_id': None,
+                'assigned_at': None,
+                'assigning': True,
+            }
+
+        try:
+            return self._start_on_first(camera_id, settings, order)
+        finally:
+            with self.lock:
+                if camera_id in self.cameras:
+                    self.cameras[camera_id]['assigning'] = False
+
+    def _start_on_first(self, camera_id, settings, order):
+        """Try the nodes in order until one starts the camera"""
+        if not order:
+            logger.error(f"No node has free capacity for camera {camera_id}")
+            return False, "No node has free capacity", None
+
+        for node_id in order:
+            with self.lock:
+                node = self.nodes.get(node_id)
+                if camera_id not in self.cameras:
+                    # Stopped while being assigned
+                    return False, "Camera was stopped", None
+                if node is None or not node['alive'] or self._sessions(node_id) >= node['capacity']:
+                    continue
+                # Reserve the slot before the (slow) start request
+                self.cameras[camera_id]['node_id'] = node_id
+                self.cameras[camera_id]['assigned_at'] = time.time()
+                url = node['url']
+            try:
+                response = requests.post(f"{url}/start", json=dict(settings, cameraId=camera_id), timeout=30)
+                if response.status_code == 200:
+                    with self.lock:
+                        # Heartbeats from before the start describe the node's previous session
+                        if node_id in self.nodes:
+                            self.nodes[node_id]['camera_id'] = camera_id
+                            self.nodes[node_id]['finished_camera_id'] = None
+                        if camera_id in self.cameras:
+                            self.cameras[camera_id]['assigned_at'] = time.time()
+                    logger.info(f"Camera {camera_id} started on node {node_id}")
+                    return True, f"Camera started on node {node_id}", node_id
+                logger.error(f"Node {node_id} failed to start camera {camera_id}: "
+                             f"{response.status_code} - {response.text}")
+            except Exception as e:
+                logger.error(f"Error starting camera {camera_id} on node {node_id}: {str(e)}")
+            with self.lock:
+                if camera_id in self.cameras:
+                    self.cameras[camera_id]['node_id'] = None
+                    self.cameras[camera_id]['assigned_at'] = None
+
+        return False, "No node could start the camera", None
+
+    def stop_camera(self, camera_id):
+        """Stop a camera and forget it"""
+        with self.lock:
+            camera = self.cameras.pop(camera_id, None)
+            node = self.nodes.get(camera['node_id']) if camera and camera['node_id'] else None
+        if camera is None:
+            return False, f"Unknown camera: {camera_id}"
+        if node is not None and node['alive']:
+            try:
+                requests.post(f"{node['url']}/stop", timeout=10)
+            except Exception as e:
+                logger.error(f"Error stopping camera {camera_id} on node {node['node_id']}: {str(e)}")
+        return True, "Camera stopped"
+
+    def owner(self, camera_id):
+        """The live node running a camera, or None"""
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            node = self.nodes.get(camera['node_id']) if camera and camera['node_id'] else None
+            return dict(node) if node is not None and node['alive'] else None
+
+    def check_nodes(self):
+        """Mark silent nodes dead and move their cameras; retry unplaced or stalled cameras"""
+        now = time.time()
+        with self.lock:
+            for node in self.nodes.values():
+                if node['alive'] and now - node['last_seen'] > config.NODE_TIMEOUT:
+                    logger.error(f"Node {node['node_id']} missed heartbeats for {now - node['last_seen']:.1f}s, "
+                                 f"moving its cameras")
+                    node['alive'] = False
+            self._rebuild_ring()
+
+            to_assign = []
+            finished = []
+            for camera_id, camera in self.cameras.items():
+                if camera.get('assigning'):
+                    continue
+                node = self.nodes.get(camera['node_id']) if camera['node_id'] else None
+                if (node is not None and node['alive'] and node.get('finished_camera_id') == camera_id
+                        and node['last_seen'] > camera['assigned_at']):
+                    # A replayed recording played to the end; do not start it again
+                    logger.info(f"Camera {camera_id} finished its replay on node {node['node_id']}")
+                    finished.append(camera_id)
+                elif node is None:
+                    to_assign.append(camera_id)
+                elif not node['alive']:
+                    camera['node_id'] = None
+                    to_assign.append(camera_id)
+                elif (node['camera_id'] != camera_id and
+                      now - camera['assigned_at'] > config.NODE_TIMEOUT):
+                    # The node gave up on the session (e.g. the camera stayed unreachable)
+                    logger.warning(f"Node {node['node_id']} is no longer running camera {camera_id}")
+                    camera['node_id'] = None
+                    to_assign.append(camera_id)
+            for camera_id in finished:
+                del self.cameras[camera_id]
+
+        for camera_id in to_assign:
+            self.assign_camera(camera_id)
+
+    def monitor(self):
+        while True:
+            try:
+                self.check_nodes()
+            except Exception as e:
+                logger.exception(f"Error checking nodes: {str(e)}")
+            time.sleep(config.NODE_HEARTBEAT_INTERVAL)
+
+    def start_monitoring(self):
+        self.monitor_thread = threading.Thread(target=self.monitor, name='coordinator-monitor')
+        self.monitor_thread.daemon = True
+        self.monitor_thread.start()
+
+    def state(self):
+        with self.lock:
+            nodes = [dict(node, sessions=self._sessions(node_id)) for node_id, node in self.nodes.items()]
+            cameras = [{key: camera.get(key) for key in ('camera_id', 'node_id', 'assigned_at', 'assigning')}
+                       for camera in self.cameras.values()]
+        return nodes, cameras
+
+
+coordinator = Coordinator()
+
+app = Flask(__name__)
+CORS(app)  # Enable CORS for all routes
+
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Coordinator health check endpoint"""
+    nodes, cameras = coordinator.state()
+    return jsonify({
+        'status': 'healthy',
+        'nodes_alive': sum(1 for node in nodes if node['alive']),
+        'cameras': len(cameras),
+        'cameras_unassigned': sum(1 for camera in cameras if camera['node_id'] is None)
+    })
+
+
+@app.route('/nodes/register', methods=['POST'])
+def register_node():
+    """Register a backend node"""
+    payload = request.json
+    if not payload or not payload.get('node_id') or not payload.get('url'):
+        return jsonify({
+            'success': False,
+            'message': 'node_id and url are required'
+        }), 400
+    # Re-assigning orphaned cameras calls back into the node, so do it off the request thread
+    threading.Thread(target=coordinator.register_node, args=(payload,), daemon=True).start()
+    return jsonify({'success': True}), 200
+
+
+@app.route('/nodes/heartbeat', methods=['POST'])
+def node_heartbeat():
+    """Receive a node heartbeat"""
+    payload = request.json or {}
+    if not coordinator.heartbeat(payload):
+        return jsonify({
+            'success': False,
+            'message': 'Unknown node, register first'
+        }), 404
+    return jsonify({'success': True}), 200
+
+
+@app.route('/nodes', methods=['GET'])
+def list_nodes():
+    """List nodes with their capacity, load and sessions"""
+    nodes, _ = coordinator.state()
+    return jsonify({'nodes': nodes})
+
+
+@app.route('/cameras', methods=['GET'])
+def list_cameras():
+    """List cameras and the node each one is assigned to"""
+    _, cameras = coordinator.state()
+    return jsonify({'cameras': cameras})
+
+
+@app.route('/cameras/<camera_id>/start', methods=['POST'])
+def start_camera(camera_id):
+    """Assign a camera to a node and start detection there"""
+    settings = request.json
+    if not settings or not settings.get('ipCameraUrl'):
+        return jsonify({
+            'success': False,
+            'message': 'Camera URL is required'
+        }), 400
+    if coordinator.owner(camera_id) is not None:
+        return jsonify({
+            'success': False,
+            'message': 'Camera is already running'
+        }), 400
+
+    success, message, node_id = coordinator.assign_camera(camera_id, settings)
+    # Unplaced cameras stay registered and are retried by the monitor
+    return jsonify({
+        'success': success,
+        'message': message,
+        'node_id': node_id
+    }), 200 if success else 503
+
+
+@app.route('/cameras/<camera_id>/stop', methods=['POST'])
+def stop_camera(camera_id):
+    """Stop a camera wherever it runs"""
+    success, message = coordinator.stop_camera(camera_id)
+    return jsonify({
+        'success': success,
+        'message': message
+    }), 200 if success else 404
+
+
+def proxy_to_owner(camera_id, path, method='GET'):
+    """Forward a request to the node running the camera (or redirect with ?redirect=1)"""
+    node = coordinator.owner(camera_id)
+    if node is None:
+        return jsonify({
+            'success': False,
+            'message': f'Camera {camera_id} is not running on any node'
+        }), 404
+
+    params = {key: value for key, value in request.args.items() if key != 'redirect'}
+    if request.args.get('redirect'):
+        query = f"?{urlencode(params)}" if params else ""
+        return redirect(f"{node['url']}/{path}{query}", code=307)
+
+    headers = {}
+    for header in ('If-None-Match', 'Authorization', 'Content-Type'):
+        if request.headers.get(header):
+            headers[header] = request.headers[header]
+    try:
+        upstream = requests.request(method, f"{node['url']}/{path}", params=params, headers=headers,
+                                    data=request.get_data() if method != 'GET' else None,
+                                    stream=True, timeout=(5, 30))
+    except Exception as e:
+        logger.error(f"Error proxying {path} for camera {camera_id} to {node['node_id']}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f"Node {node['node_id']} is unreachable"
+        }), 502
+
+    def relay():
+        try:
+            # chunk_size=None yields data as soon as it arrives, which MJPEG needs
+            for chunk in upstream.iter_content(chunk_size=None):
+                yield chunk
+        finally:
+            upstream.close()
+
+    excluded = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+    response_headers = [(key, value) for key, value in upstream.headers.items() if key.lower() not in excluded]
+    response_headers.append(('X-Served-By', node['node_id']))
+    return Response(stream_with_context(relay()), status=upstream.status_code, headers=response_headers)
+
+
+@app.route('/cameras/<camera_id>/video_feed')
+def camera_video_feed(camera_id):
+    return proxy_to_owner(camera_id, 'video_feed')
+
+
+@app.route('/cameras/<camera_id>/snapshot')
+def camera_snapshot(camera_id):
+    return proxy_to_owner(camera_id, 'snapshot')
+
+
+@app.route('/cameras/<camera_id>/status')
+def camera_status(camera_id):
+    return proxy_to_owner(camera_id, 'status')
+
+
+@app.route('/cameras/<camera_id>/configure', methods=['POST'])
+def camera_configure(camera_id):
+    response = proxy_to_owner(camera_id, 'configure', method='POST')
+    # Keep the stored settings in sync so a failover restarts with them
+    status = response[1] if isinstance(response, tuple) else response.status_code
+    if status == 200:
+        with coordinator.lock:
+            camera = coordinator.cameras.get(camera_id)
+            if camera is not None:
+                camera['settings'] = dict(camera['settings'], **(request.json or {}))
+    return response
+
+
+if __name__ == '__main__':
+    coordinator.start_monitoring()
+    logger.info(f"Coordinator listening on port {config.COORDINATOR_PORT}")
+    app.run(
+        host='0.0.0.0',
+        port=config.COORDINATOR_PORT,
+        debug=False,
+        threaded=True
+    )
@@ -1,13 +1,19 @@
-import cv2
 import numpy as np
 import time
-from ultralytics import YOLO
 import config
 import logging
 import requests
 from datetime import datetime
 import os
 import json
+import threading
+from frame_buffers import PreviewBufferPool
+from model_registry import get_model
+from profiles import resolve_profile
+from replay import ReplayCapture
+from cascade import CascadeInference
+import probing
+from notifications import aggregator
 
 # Configure logging
 logging.basicConfig(
@@ -16,13 +22,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger('object_detector')
 
+def build_stream_url(camera_url, camera_port=''):
+    """Build the stream URL (or webcam index) that cv2.VideoCapture should open"""
+    # Handle webcam URL format (webcam://0, webcam://1, etc.)
+    if camera_url.startswith('webcam://'):
+        try:
+            # Extract webcam index from URL (default to 0 if not provided or invalid)
+            webcam_index = int(camera_url.replace('webcam://', '') or 0)
+            logger.info(f"Using local webcam with index: {webcam_index}")
+            return webcam_index
+        except ValueError:
+            logger.error(f"Invalid webcam index: {camera_url.replace('webcam://', '')}")
+            return 0
+    # Form the stream URL based on protocol
+    elif camera_url.startswith(('rtmp://', 'srt://')):
+        # For RTMP and SRT, use the URL as is or append port if specified
+        return f"{camera_url}:{camera_port}" if camera_port and ':' not in camera_url else camera_url
+    elif not camera_url.startswith(('http://', 'https://')):
+        # For HTTP streams without protocol prefix, add it
+        camera_url = f"http://{camera_url}"
+        return f"{camera_url}:{camera_port}" if camera_port else camera_url
+    else:
+        # For URLs with protocol already specified
+        return f"{camera_url}:{camera_port}" if camera_port and ':' not in camera_url else camera_url
+
 class ObjectDetector:
     def __init__(self):
         self.model = None
+        self.shared_model = None  # Model shared with other cameras using the same variant
+        self.profile = None
+        self.inference_kwargs = {}
+        self.cascade = None  # Two-stage inference when the profile defines a cascade
         self.is_running = False
         self.stream_url = None
         self.ntfy_topic = None
         self.ntfy_priority = "default"
+        self.camera_name = None  # Shown in notifications, e.g. "2 persons, 3 cars on cam-4"
         self.last_notification_time = {}  # To track when we last notified about each class
         self.notification_cooldown = 60  # seconds between notifications for the same object class
         self.cap = None
@@ -34,6 +69,21 @@ class ObjectDetector:
         self.enable_person_detection = True  # Default to enabled
         self.last_heartbeat = 0  # Heartbeat timestamp
         self.heartbeat_interval = 5  # Seconds between heartbeats
+        self.preview_pool = PreviewBufferPool(config.PREVIEW_MAX_DIM, config.PREVIEW_BUFFER_DEPTH)
+        self._last_callback_time = 0
+        self._capture_buffer = None  # Reused as the decode target for cap.read()
+        self.detection_interval = config.DETECTION_INTERVAL
+        self.replay_source = None  # Recorded video or frame directory when replaying
+        self.replay_realtime = True
+        self.replay_fps = None
+        self.replay_finished = False  # Set when a replayed recording has been played to the end
+        self.frames_processed = 0
+        self.detection_thread = None
+        self.settings = {}
+        self.pending_reconfigure = None  # Reconfiguration waiting to be applied between frames
+        self.pending_lock = threading.Lock()
+        self.reconfigure_lock = threading.Lock()  # Serialises reconfigure() calls
+        self.last_reconfigure_latency = None
         
     def heartbeat(self):
         """Update the heartbeat timestamp to indicate the detector is still alive"""
@@ -51,22 +101,125 @@ class ObjectDetector:
         age = self.get_last_heartbeat_age()
         return age < max_age
 
+    def now(self):
+        """Current time for cooldowns: media time when replaying, wall-clock time otherwise"""
+        if self.replay_source is not None and self.cap is not None:
+            return self.cap.media_time()
+        return time.time()
+
+    def digest_clock(self):
+        """Clock for notification digests: media time when replaying, None for the aggregator's own timers"""
+        return self.now() if self.replay_source is not None else None
+
+    def open_capture(self):
+        """Open the configured camera stream or replay source"""
+        if self.replay_source is not None:
+            return ReplayCapture(self.replay_source, realtime=self.replay_realtime, fps=self.replay_fps)
+        return probing.open_capture(self.stream_url)
+
     def set_frame_callback(self, callback):
         """Set a callback function to receive frames with detection boxes"""
         self.frame_callback = callback
 
-    def load_model(self):
-        """Load the YOLOv11m model"""
+    def load_model(self, model_path=None):
+        """Load the detection model (YOLOv11m unless another path is given)"""
         try:
-            model_path = config.MODEL_PATH
-            logger.info(f"Loading model from {model_path}")
-            self.model = YOLO(model_path)
-            logger.info("Model loaded successfully")
+            self.shared_model = get_model(model_path or config.MODEL_PATH)
+            self.model = self.shared_model.model
             return True
         except Exception as e:
             logger.exception(f"Error loading model: {str(e)}")
             return False
 
+    def prepare_settings(self, settings):
+        """Validate settings and build the session parameters they describe.
+
+        Loads the profile's model if needed, so a running session keeps detecting
+        with its current parameters meanwhile. Raises ValueError for invalid settings.
+        """
+        camera_url = settings.get('ipCameraUrl', '')
+        camera_port = settings.get('ipCameraPort', '')
+        params = {
+            'replay_source': None,
+            'replay_realtime': True,
+            'replay_fps': None,
+        }
+        
+        # Handle replay URL format (replay:///path/to/video.mp4 or a frame directory)
+        if camera_url.startswith('replay://'):
+            params['replay_source'] = camera_url[len('replay://'):]
+            params['replay_realtime'] = settings.get('replaySpeed', 'realtime') != 'max'
+            params['replay_fps'] = settings.get('replayFps')
+            params['stream_url'] = camera_url
+        else:
+            params['stream_url'] = build_stream_url(camera_url, camera_port)
+        
+        params.update({
+            'ntfy_topic': settings.get('ntfyTopic'),
+            'ntfy_priority': settings.get('ntfyPriority', 'default'),
+            'camera_name': settings.get('cameraName'),
+            'enable_person_detection': settings.get('enablePersonDetection', True),
+            'user_id': settings.get('userId', 'unknown-user'),
+            'supabase_url': settings.get('supabaseUrl'),
+            'supabase_key': settings.get('supabaseKey'),
+            'enable_logging': settings.get('enableLogging', False),
+        })
+        # A max-speed replay processes every frame unless an interval is requested
+        max_speed_replay = params['replay_source'] is not None and not params['replay_realtime']
+        default_interval = 0 if max_speed_replay else config.DETECTION_INTERVAL
+        try:
+            params['detection_interval'] = float(settings.get('detectionInterval', default_interval))
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid detection interval: {settings.get('detectionInterval')}")
+
+        # Resolve the detection profile and load (or reuse) its model
+        try:
+            profile = resolve_profile(settings)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid detection profile: {str(e)}")
+        
+        try:
+            shared_model = get_model(profile.model_path)
+        except Exception as e:
+            logger.exception(f"Error loading model: {str(e)}")
+            raise ValueError("Failed to load detection model")
+        
+        try:
+            params['inference_kwargs'] = profile.inference_kwargs(shared_model)
+        except ValueError as e:
+            raise ValueError(f"Invalid detection profile: {str(e)}")
+        params['profile'] = profile
+        params['shared_model'] = shared_model
+        
+        # Screen every frame with a smaller model when the profile defines a cascade
+        params['cascade'] = None
+        if profile.cascade:
+            try:
+                screener = get_model(profile.screener_model_path)
+            except Exception as e:
+                logger.exception(f"Error loading screener model: {str(e)}")
+                raise ValueError("Failed to load screener model")
+            try:
+                screener_kwargs = profile.inference_kwargs(screener, profile.cascade['input_size'])
+            except ValueError as e:
+                raise ValueError(f"Invalid detection profile: {str(e)}")
+            params['cascade'] = CascadeInference(
+                screener, shared_model, screener_kwargs, params['inference_kwargs'],
+                confidence=profile.confidence,
+                escalate_low=float(profile.cascade['escalate_low']),
+                escalate_high=float(profile.cascade['escalate_high']),
+                escalate_classes=profile.cascade['escalate_classes'],
+                audit_interval=profile.cascade['audit_interval'],
+            )
+        return params
+
+    def apply_params(self, params):
+        """Apply parameters built by prepare_settings"""
+        # Parameter names match the detector attributes they set
+        for name, value in params.items():
+            setattr(self, name, value)
+        self.model = self.shared_model.model
+
     def start_detection(self, settings):
         """Start object detection with the given settings"""
         if self.is_running:
@@ -77,51 +230,36 @@ class ObjectDetector:
         self.heartbeat()
         
         # Extract settings
-        camera_url = settings.get('ipCameraUrl', '')
-        camera_port = settings.get('ipCameraPort', '')
+        try:
+            params = self.prepare_settings(settings)
+        except ValueError as e:
+            logger.error(str(e))
+            return False, str(e)
         
-        # Handle webcam URL format (webcam://0, webcam://1, etc.)
-        if camera_url.startswith('webcam://'):
-            try:
-                # Extract webcam index from URL (default to 0 if not provided or invalid)
-                webcam_index = int(camera_url.replace('webcam://', '') or 0)
-                logger.info(f"Using local webcam with index: {webcam_index}")
-                self.stream_url = webcam_index
-            except ValueError:
-                logger.error(f"Invalid webcam index: {camera_url.replace('webcam://', '')}")
-                self.stream_url = 0
-        # Form the stream URL based on protocol
-        elif camera_url.startswith(('rtmp://', 'srt://')):
-            # For RTMP and SRT, use the URL as is or append port if specified
-            self.stream_url = f"{camera_url}:{camera_port}" if camera_port and ':' not in camera_url else camera_url
-        elif not camera_url.startswith(('http://', 'https://')):
-            # For HTTP streams without protocol prefix, add it
-            camera_url = f"http://{camera_url}"
-            self.stream_url = f"{camera_url}:{camera_port}" if camera_port else camera_url
-        else:
-            # For URLs with protocol already specified
-            self.stream_url = f"{camera_url}:{camera_port}" if camera_port and ':' not in camera_url else camera_url
+        self.apply_params(params)
+        self.settings = dict(settings)
+        self.pending_reconfigure = None
+        if self.replay_source is not None:
+            # Cooldowns run on media time, so earlier wall-clock timestamps do not apply
+            self.last_notification_time = {}
+            if self.ntfy_topic:
+                aggregator.reset_clock(self.ntfy_topic)
             
         logger.info(f"Camera stream URL: {self.stream_url}")
-        
-        self.ntfy_topic = settings.get('ntfyTopic')
-        self.ntfy_priority = settings.get('ntfyPriority', 'default')
-        self.enable_person_detection = settings.get('enablePersonDetection', True)
         logger.info(f"Person detection notifications: {'Enabled' if self.enable_person_detection else 'Disabled'}")
-        
-        self.user_id = settings.get('userId', 'unknown-user')
-        self.supabase_url = settings.get('supabaseUrl')
-        self.supabase_key = settings.get('supabaseKey')
-        self.enable_logging = settings.get('enableLogging', False)
+        logger.info(f"Detection profile: {self.profile.to_dict()}")
 
-        # Load model if not already loaded
-        if self.model is None and not self.load_model():
-            return False, "Failed to load detection model"
+        # Use stream metadata from a recent probe instead of discovering it on the first frame
+        probe = probing.probe_cache.get(self.stream_url) if self.replay_source is None else None
+        if probe is not None:
+            logger.info(f"Using cached probe: {probe['width']}x{probe['height']} "
+                        f"{probe['codec'] or 'unknown codec'} at {probe['fps'] or 'unknown'} fps")
+            self.preview_pool.reserve((probe['height'], probe['width'], 3))
 
         # Open video stream
         try:
             logger.info(f"Opening video stream: {self.stream_url}")
-            self.cap = cv2.VideoCapture(self.stream_url)
+            self.cap = self.open_capture()
             if not self.cap.isOpened():
                 logger.error("Failed to open video stream")
                 return False, "Failed to open video stream"
@@ -131,16 +269,98 @@ class ObjectDetector:
 
         # Start detection
         self.is_running = True
+        self.replay_finished = False
+        self.frames_processed = 0
         logger.info("Detection started")
 
         # Run detection in a separate thread to not block the response
-        import threading
-        detection_thread = threading.Thread(target=self.detection_loop)
-        detection_thread.daemon = True
-        detection_thread.start()
+        self.detection_thread = threading.Thread(target=self.detection_loop, name='detection-loop')
+        self.detection_thread.daemon = True
+        self.detection_thread.start()
 
         return True, "Detection started successfully"
 
+    def reconfigure(self, changes, timeout=None):
+        """Update a running session's settings without restarting it.
+
+        The new parameters are prepared in the calling thread and applied
+        atomically by the detection loop between frames. The stream is only
+        reopened when the camera changes. Returns (success, message, info).
+        """
+        if not self.is_running:
+            return False, "Detection is not running", None
+
+        with self.reconfigure_lock:
+            with self.pending_lock:
+                pending = self.pending_reconfigure
+            # Build on a reconfiguration that has not been applied yet
+            settings = dict(pending['settings'] if pending else self.settings)
+            settings.update(changes)
+            
+            try:
+                params = self.prepare_settings(settings)
+            except ValueError as e:
+                logger.error(f"Invalid reconfiguration: {str(e)}")
+                return False, str(e), None
+
+            camera_fields = ('stream_url', 'replay_source', 'replay_realtime', 'replay_fps')
+            current = pending['params'] if pending else vars(self)
+            reopen = (pending is not None and pending['reopen']) or any(
+                params[field] != current[field] for field in camera_fields)
+            
+            request = {
+                'params': params,
+                'settings': settings,
+                'reopen': reopen,
+                'requested_at': time.time(),
+                'applied': threading.Event(),
+                'latency': None,
+            }
+            with self.pending_lock:
+                self.pending_reconfigure = request
+            logger.info(f"Reconfiguration queued: {sorted(changes)}{' (reopening stream)' if reopen else ''}")
+
+            applied = request['applied'].wait(timeout)
+            info = {
+                'applied': applied,
+                'reopened': reopen,
+                'latency_ms': request['latency'] * 1000 if applied else None,
+            }
+            if applied:
+                return True, "Settings applied", info
+            return True, "Settings will be applied before the next frame", info
+
+    def apply_pending_reconfigure(self):
+        """Apply a queued reconfiguration; called by the detection loop between frames"""
+        with self.pending_lock:
+            request, self.pending_reconfigure = self.pending_reconfigure, None
+        if request is None:
+            return
+
+        self.apply_params(request['params'])
+        self.settings = request['settings']
+        
+        if request['reopen']:
+            logger.info(f"Camera changed, reopening video stream: {self.stream_url}")
+            try:
+                if self.cap is not None:
+                    self.cap.release()
+                self._capture_buffer = None
+                if self.replay_source is not None:
+                    self.last_notification_time = {}
+                    if self.ntfy_topic:
+                        aggregator.reset_clock(self.ntfy_topic)
+                self.cap = self.open_capture()
+            except Exception as e:
+                # The loop's reconnection logic takes over from here
+                logger.exception(f"Error reopening video stream: {str(e)}")
+                self.cap = None
+        
+        request['latency'] = time.time() - request['requested_at']
+        self.last_reconfigure_latency = request['latency']
+        request['applied'].set()
+        logger.info(f"Reconfiguration applied in {request['latency'] * 1000:.1f}ms")
+
     def stop_detection(self):
         """Stop the object detection process"""
         if not self.is_running:
@@ -165,9 +385,12 @@ class ObjectDetector:
 
         while self.is_running:
             try:
+                # Settings changes are only applied here, between frames
+                self.apply_pending_reconfigure()
+                
                 # Check if enough time has passed since last detection
                 current_time = time.time()
-                if current_time - last_detection_time < config.DETECTION_INTERVAL:
+                if current_time - last_detection_time < self.detection_interval:
                     time.sleep(0.1)  # Short sleep to prevent CPU hogging
                     continue
 
@@ -177,7 +400,7 @@ class ObjectDetector:
                     try:
                         if self.cap is not None:
                             self.cap.release()
-                        self.cap = cv2.VideoCapture(self.stream_url)
+                        self.cap = self.open_capture()
                         # Wait for connection to establish
                         time.sleep(1)  
                         
@@ -210,7 +433,11 @@ class ObjectDetector:
                 try:
                     # Set a timeout for frame reading (cv2 doesn't have built-in timeout)
                     start_time = time.time()
-                    ret, frame = self.cap.read()
+                    # Decode into the previous frame's buffer when the resolution is unchanged
+                    if self._capture_buffer is not None:
+                        ret, frame = self.cap.read(self._capture_buffer)
+                    else:
+                        ret, frame = self.cap.read()
                     if time.time() - start_time > 10:  # If frame reading takes more than 10 seconds
                         logger.warning("Frame reading took too long, may be stuck")
                         # Force a reconnection
@@ -223,6 +450,12 @@ class ObjectDetector:
                 except Exception as e:
                     logger.exception(f"Exception during frame reading: {str(e)}")
                 
+                if getattr(self.cap, 'finished', False):
+                    # End of a replayed recording rather than a stream failure
+                    self.replay_finished = True
+                    self.is_running = False
+                    break
+                
                 if not frame_read_success or not ret or frame is None:
                     logger.warning("Failed to read frame from stream")
                     consecutive_errors += 1
@@ -236,7 +469,7 @@ class ObjectDetector:
                             if self.cap is not None:
                                 self.cap.release()
                             time.sleep(2)  # Wait before reconnecting
-                            self.cap = cv2.VideoCapture(self.stream_url)
+                            self.cap = self.open_capture()
                             logger.info("Camera reconnection attempted")
                         except Exception as e:
                             logger.exception(f"Error during camera reconnection: {str(e)}")
@@ -246,62 +479,27 @@ class ObjectDetector:
                 
                 # Reset error counter on successful frame read
                 consecutive_errors = 0
+                self._capture_buffer = frame
                 last_detection_time = current_time
 
                 # Run detection
                 try:
-                    results = self.model(frame, conf=config.CONFIDENCE_THRESHOLD)
-                    
-                    # Process results
-                    detections = []
-                    # Create a copy of the frame for drawing boxes
-                    frame_with_boxes = frame.copy()
-                    
-                    for r in results:
-                        boxes = r.boxes
-                        for box in boxes:
-                            try:
-                                cls_id = int(box.cls.item())
-                                conf = float(box.conf.item())
-                                cls_name = self.model.names[cls_id]
-                                xyxy = box.xyxy.tolist()[0]  # Get box coordinates
-                                
-                                # Draw bounding box
-                                x1, y1, x2, y2 = map(int, xyxy)
-                                color = (0, 255, 0)  # Green color for box
-                                cv2.rectangle(frame_with_boxes, (x1, y1), (x2, y2), color, 2)
-                                
-                                # Add label
-                                label = f"{cls_name}: {conf:.2f}"
-                                cv2.putText(frame_with_boxes, label, (x1, y1 - 10), 
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                                
-                                detections.append({
-                                    'class': cls_name,
-                                    'confidence': conf,
-                                    'box': xyxy
-                                })
-                            except Exception as e:
-                                logger.error(f"Error processing detection box: {str(e)}")
-                                continue
+                    # Thresholds, input size and class allow-list come from the camera's profile
+                    if self.cascade is not None:
+                        detections = self.cascade.detect(frame)
+                    else:
+                        detections = self.shared_model.detect(frame, **self.inference_kwargs)
+                    self.frames_processed += 1
                     
                     # Send frame to callback if available
-                    if self.frame_callback and frame_with_boxes is not None:
+                    if self.frame_callback:
                         try:
-                            # Resize frame for streaming (to reduce bandwidth)
-                            h, w = frame_with_boxes.shape[:2]
-                            max_dim = 480  # Reduced from 640 for better performance
-                            if max(h, w) > max_dim:
-                                scale = max_dim / max(h, w)
-                                new_h, new_w = int(h * scale), int(w * scale)
-                                # Use INTER_AREA for downsampling (better quality for streaming)
-                                frame_with_boxes = cv2.resize(frame_with_boxes, (new_w, new_h), 
-                                                            interpolation=cv2.INTER_AREA)
-                            
                             # Skip frames to reduce processing load
                             current_ms = int(time.time() * 1000)
-                            if not hasattr(self, '_last_callback_time') or current_ms - getattr(self, '_last_callback_time', 0) >= 33:  # ~30fps
-                                self.frame_callback(frame_with_boxes)
+                            if current_ms - self._last_callback_time >= 33:  # ~30fps
+                                # Resize first into a pooled buffer, then draw scaled boxes on the preview
+                                preview = self.preview_pool.render(frame, detections)
+                                self.frame_callback(preview)
                                 self._last_callback_time = current_ms
                         except Exception as e:
                             logger.exception(f"Error in frame callback: {str(e)}")
@@ -312,6 +510,10 @@ class ObjectDetector:
                             self.process_detections(detections, frame)
                         except Exception as e:
                             logger.exception(f"Error processing detections: {str(e)}")
+                    
+                    # Replayed digests are sent by media time rather than wall-clock timers
+                    if self.replay_source is not None and self.ntfy_topic:
+                        aggregator.tick(self.ntfy_topic, self.now())
                 
                 except Exception as e:
                     logger.exception(f"Error during detection: {str(e)}")
@@ -324,6 +526,10 @@ class ObjectDetector:
         # Record exit reason        
         logger.info(f"Detection loop ended. is_running={self.is_running}")
         
+        # Do not hold back this session's pending digest
+        if self.ntfy_topic:
+            aggregator.flush(self.ntfy_topic, now=self.digest_clock())
+        
         # Clean up resources when loop ends
         try:
             if self.cap is not None:
@@ -334,18 +540,22 @@ class ObjectDetector:
 
     def process_detections(self, detections, frame):
         """Process detections by sending notifications and logging to Supabase"""
-        current_time = time.time()
+        current_time = self.now()
         
+        # Notifications are per class: count the boxes and keep the best confidence
+        classes = {}
         for detection in detections:
-            object_class = detection['class']
-            confidence = detection['confidence']
+            count, confidence = classes.get(detection['class'], (0, 0.0))
+            classes[detection['class']] = (count + 1, max(confidence, detection['confidence']))
+        
+        for object_class, (count, confidence) in classes.items():
+            cooled_down = (object_class not in self.last_notification_time or
+                           current_time - self.last_notification_time.get(object_class, 0) > self.notification_cooldown)
             
-            # Send priority notifications for person detections with cooldown
+            # Send priority notifications for person detections with cooldown (immediately, never batched)
             if object_class.lower() == 'person' and self.enable_person_detection:
-                last = self.last_notification_time.get(object_class, 0)
-                if self.ntfy_topic and (object_class not in self.last_notification_time or 
-                                         current_time - last > self.notification_cooldown):
-                    self.send_notification(object_class, confidence, is_priority=True)
+                if self.ntfy_topic and cooled_down:
+                    self.send_notification(object_class, confidence, is_priority=True, count=count)
                     self.last_notification_time[object_class] = current_time
                     # Log person detection to Supabase if enabled
                     if self.enable_logging and self.supabase_url and self.supabase_key:
@@ -353,73 +563,36 @@ class ObjectDetector:
                 continue
             
             # For other objects, check the cooldown period
-            if (object_class not in self.last_notification_time or 
-                current_time - self.last_notification_time.get(object_class, 0) > self.notification_cooldown):
-                
-                # Send notification
+            if cooled_down:
+                # Queue notification for the topic's next digest
                 if self.ntfy_topic:
-                    self.send_notification(object_class, confidence)
+                    aggregator.add(self.ntfy_topic, self.camera_name, object_class, count, confidence,
+                                   self.ntfy_priority, now=self.digest_clock())
                     self.last_notification_time[object_class] = current_time
                 
                 # Log to Supabase if enabled
                 if self.enable_logging and self.supabase_url and self.supabase_key:
                     self.log_detection(object_class, confidence)
 
-    def send_notification(self, object_class, confidence, is_priority=False):
-        """Send a notification using NTFY"""
-        try:
-            # Special handling for person detection
-            if object_class.lower() == 'person':
-                title = "Person Detected!"  # Remove emoji characters that cause encoding issues
-                message = f"A person was detected with {confidence:.2%} confidence"
-                priority = "urgent"  # Set higher priority for person detections
-                tags = "warning,eyes,bell"
+    def send_notification(self, object_class, confidence, is_priority=False, count=1):
+        """Send a notification using NTFY immediately"""
+        where = f" on {self.camera_name}" if self.camera_name else ""
+        # Special handling for person detection
+        if object_class.lower() == 'person':
+            title = "Person Detected!"  # Remove emoji characters that cause encoding issues
+            if count > 1:
+                message = f"{count} persons were detected{where} with up to {confidence:.2%} confidence"
             else:
-                title = f"Object Detected: {object_class}"
-                message = f"Detected {object_class} with {confidence:.2%} confidence"
-                priority = self.ntfy_priority if not is_priority else "high"
-                tags = "warning"
-            
-            # Add timestamp to the message
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            message = f"[{timestamp}] {message}"
-            
-            # Use only ASCII characters in headers to avoid encoding issues
-            headers = {
-                "Title": title,
-                "Priority": priority,
-                "Tags": tags,
-                "Content-Type": "text/plain; charset=utf-8"  # Ensure UTF-8 content type
-            }
-            
-            # Support full URL or base+topic
-            if self.ntfy_topic.startswith(("http://", "https://")):
-                url = self.ntfy_topic
-            else:
-                base = config.NTFY_BASE_URL.rstrip("/")
-                topic = self.ntfy_topic.lstrip("/")
-                url = f"{base}/{topic}"
-            
-            # Ensure we're using utf-8 for the message body
-            message_bytes = message.encode('utf-8')
-            
-            # Use the requests library with proper encoding
-            response = requests.post(
-                url, 
-                data=message_bytes,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"Notification sent for {object_class}")
-            else:
-                logger.error(f"Failed to send notification: {response.status_code} - {response.text}")
+                message = f"A person was detected{where} with {confidence:.2%} confidence"
+            priority = "urgent"  # Set higher priority for person detections
+            tags = "warning,eyes,bell"
+        else:
+            title = f"Object Detected: {object_class}"
+            message = f"Detected {object_class}{where} with {confidence:.2%} confidence"
+            priority = self.ntfy_priority if not is_priority else "high"
+            tags = "warning"
         
-        except Exception as e:
-            logger.error(f"Error sending notification: {str(e)}")
-            # Log more details to help diagnose the issue
-            import traceback
-            logger.debug(f"Notification error details: {traceback.format_exc()}")
+        aggregator.send_now(self.ntfy_topic, title, message, priority, tags, now=self.digest_clock())
 
     def log_detection(self, object_class, confidence):
         """Log detection to Supabase"""
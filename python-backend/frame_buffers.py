@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+import logging
+
+logger = logging.getLogger('frame_buffers')
+
+# Colour and font used for detection overlays on the preview
+BOX_COLOR = (0, 255, 0)
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class PreviewBufferPool:
+    """Ring of preallocated preview buffers owned by a single camera.
+
+    Each processed frame is resized straight into the next buffer of the ring,
+    so the hot loop does not allocate a new image per frame. Buffers handed to
+    consumers are marked read-only and are only rewritten once the ring wraps
+    around, which lets the stream share the reference instead of copying it.
+    """
+
+    def __init__(self, max_dim=480, depth=3):
+        self.max_dim = max_dim
+        self.depth = max(2, int(depth))
+        self.source_shape = None
+        self.allocated_dim = None
+        self.scale = 1.0
+        self.buffers = []
+        self.index = 0
+        self.allocations = 0  # Number of times the ring had to be (re)allocated
+
+    def _allocate(self, source_shape):
+        """Allocate the ring for a new source resolution"""
+        h, w = source_shape[:2]
+        channels = source_shape[2] if len(source_shape) > 2 else 1
+        max_dim = self.max_dim  # May be changed concurrently by the stream hub
+        self.scale = min(1.0, max_dim / max(h, w))
+        new_h, new_w = max(1, int(h * self.scale)), max(1, int(w * self.scale))
+        shape = (new_h, new_w, channels) if channels > 1 else (new_h, new_w)
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.depth)]
+        self.source_shape = source_shape
+        self.allocated_dim = max_dim
+        self.index = 0
+        self.allocations += 1
+        logger.info(f"Allocated {self.depth} preview buffers of {new_w}x{new_h} for {w}x{h} source")
+
+    def reserve(self, source_shape):
+        """Allocate the ring up front when the source resolution is already known"""
+        if source_shape != self.source_shape or self.max_dim != self.allocated_dim:
+            self._allocate(source_shape)
+
+    def acquire(self, source_shape):
+        """Return the next writable buffer for a frame of the given shape"""
+        # The ring is rebuilt when the source resolution or requested preview size changes
+        if source_shape != self.source_shape or self.max_dim != self.allocated_dim:
+            self._allocate(source_shape)
+        buffer = self.buffers[self.index]
+        self.index = (self.index + 1) % self.depth
+        buffer.flags.writeable = True
+        return buffer
+
+    def render(self, frame, detections):
+        """Resize the frame into a pooled buffer and draw scaled detections on it"""
+        preview = self.acquire(frame.shape)
+        if self.scale < 1.0:
+            # Use INTER_AREA for downsampling (better quality for streaming)
+            cv2.resize(frame, (preview.shape[1], preview.shape[0]), dst=preview,
+                       interpolation=cv2.INTER_AREA)
+        else:
+            np.copyto(preview, frame)
+
+        draw_detections(preview, detections, self.scale)
+
+        # Consumers share this reference, so it must not be modified downstream
+        preview.flags.writeable = False
+        return preview
+
+
+def draw_detections(image, detections, scale=1.0):
+    """Draw boxes and labels for detections given in source-frame coordinates"""
+    for detection in detections:
+        x1, y1, x2, y2 = (int(v * scale) for v in detection['box'])
+        cv2.rectangle(image, (x1, y1), (x2, y2), BOX_COLOR, 2)
+
+        label = f"{detection['class']}: {detection['confidence']:.2f}"
+        cv2.putText(image, label, (x1, y1 - 10), LABEL_FONT, 0.5, BOX_COLOR, 2)
@@ -0,0 +1,114 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from detector import ObjectDetector
+from standins import StandinServer
+
+logger = logging.getLogger('harness')
+
+
+class ReplayHarness:
+    """Run a recorded video or frame directory through the detector against local stand-ins"""
+
+    def __init__(self, source, speed='max', settings=None, fps=None):
+        self.source = os.path.abspath(source)
+        self.speed = speed
+        self.settings = settings or {}
+        self.fps = fps
+
+    def run(self, timeout=None):
+        """Replay the whole recording and return notifications, logged rows and throughput"""
+        with StandinServer() as standin:
+            detector = ObjectDetector()
+            settings = {
+                'ipCameraUrl': f"replay://{self.source}",
+                'replaySpeed': self.speed,
+                'replayFps': self.fps,
+                'ntfyTopic': standin.ntfy_url('replay'),
+                'supabaseUrl': standin.url,
+                'supabaseKey': 'standin-key',
+                'enableLogging': True,
+                'userId': 'replay-user',
+            }
+            settings.update(self.settings)
+
+            start_time = time.time()
+            success, message = detector.start_detection(settings)
+            if not success:
+                raise RuntimeError(f"Failed to start replay: {message}")
+
+            detector.detection_thread.join(timeout)
+            timed_out = detector.detection_thread.is_alive()
+            if timed_out:
+                logger.warning(f"Replay did not finish within {timeout}s, stopping")
+                detector.stop_detection()
+                detector.detection_thread.join()
+            elapsed = time.time() - start_time
+
+            return {
+                'source': self.source,
+                'speed': self.speed,
+                'timed_out': timed_out,
+                'frames_processed': detector.frames_processed,
+                'elapsed': elapsed,
+                'fps': detector.frames_processed / elapsed if elapsed > 0 else 0.0,
+                'notifications': standin.get_notifications(),
+                'rows': standin.get_rows('detection_events'),
+            }
+
+
+def check_expectations(result, args):
+    """Return a list of failed expectations"""
+    failures = []
+    notified = {n['title'] for n in result['notifications']}
+    logged = {row['object_type'] for row in result['rows']}
+
+    if result['timed_out']:
+        failures.append("replay timed out")
+    if len(result['notifications']) < args.min_notifications:
+        failures.append(f"expected at least {args.min_notifications} notifications, got {len(result['notifications'])}")
+    if len(result['rows']) < args.min_rows:
+        failures.append(f"expected at least {args.min_rows} logged rows, got {len(result['rows'])}")
+    for cls_name in args.expect_class or []:
+        if cls_name not in logged and not any(cls_name.lower() in title.lower() for title in notified if title):
+            failures.append(f"expected a detection of '{cls_name}'")
+    if args.min_fps and result['fps'] < args.min_fps:
+        failures.append(f"expected at least {args.min_fps} fps, got {result['fps']:.2f}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recording through the detector against local stand-ins')
+    parser.add_argument('source', help='Video file or directory of frames')
+    parser.add_argument('--speed', choices=('max', 'realtime'), default='max')
+    parser.add_argument('--fps', type=float, help='Frame rate of a frame directory (default: REPLAY_FPS)')
+    parser.add_argument('--profile', help='Detection profile to use')
+    parser.add_argument('--timeout', type=float, help='Seconds to wait for the replay to finish')
+    parser.add_argument('--output', help='Write the full result as JSON to this file')
+    parser.add_argument('--min-notifications', type=int, default=0)
+    parser.add_argument('--min-rows', type=int, default=0)
+    parser.add_argument('--min-fps', type=float, default=0)
+    parser.add_argument('--expect-class', action='append', help='Class that must be detected (repeatable)')
+    args = parser.parse_args()
+
+    settings = {'detectionProfile': args.profile} if args.profile else {}
+    result = ReplayHarness(args.source, args.speed, settings, args.fps).run(args.timeout)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    print(f"Frames processed: {result['frames_processed']} in {result['elapsed']:.2f}s ({result['fps']:.2f} fps)")
+    print(f"Notifications: {len(result['notifications'])}, logged rows: {len(result['rows'])}")
+
+    failures = check_expectations(result, args)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Runs a coordinator and several backend nodes as local processes, for trying
+# out and testing sharding, failover and stream routing on one machine.
+
+
+def spawn(script, env_overrides):
+    env = dict(os.environ, DEBUG='false', **env_overrides)
+    return subprocess.Popen([sys.executable, script], env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a coordinator and several backend nodes locally')
+    parser.add_argument('--nodes', type=int, default=3, help='Number of backend nodes')
+    parser.add_argument('--coordinator-port', type=int, default=6000)
+    parser.add_argument('--first-node-port', type=int, default=5001)
+    args = parser.parse_args()
+
+    coordinator_url = f"http://127.0.0.1:{args.coordinator_port}"
+    processes = [spawn('coordinator.py', {'COORDINATOR_PORT': str(args.coordinator_port)})]
+    print(f"Coordinator: {coordinator_url}")
+
+    for i in range(args.nodes):
+        port = args.first_node_port + i
+        processes.append(spawn('app.py', {
+            'FLASK_PORT': str(port),
+            'NODE_ID': f"node-{i + 1}",
+            'NODE_URL': f"http://127.0.0.1:{port}",
+            'COORDINATOR_URL': coordinator_url,
+        }))
+        print(f"Node node-{i + 1}: http://127.0.0.1:{port} (pid {processes[-1].pid})")
+
+    print("Start a camera with POST /cameras/<camera_id>/start on the coordinator; "
+          "kill a node's pid to watch its cameras move. Ctrl-C stops everything.")
+    try:
+        while processes[0].poll() is None:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import threading
+import logging
+from ultralytics import YOLO
+
+logger = logging.getLogger('model_registry')
+
+
+class SharedModel:
+    """A loaded YOLO model shared by every camera whose profile uses it"""
+
+    def __init__(self, path):
+        self.path = path
+        self.model = YOLO(path)
+        # YOLO predictors keep per-call state, so inference on one model is serialised
+        self.lock = threading.Lock()
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def class_ids(self, class_names):
+        """Map class names to model class ids, ignoring names the model does not know"""
+        lookup = {name.lower(): cls_id for cls_id, name in self.names.items()}
+        ids = []
+        for name in class_names:
+            cls_id = lookup.get(name.lower())
+            if cls_id is None:
+                logger.warning(f"Class '{name}' is not known to model {self.path}, ignoring")
+                continue
+            ids.append(cls_id)
+        return ids
+
+    def predict(self, frame, **kwargs):
+        """Run inference on a frame"""
+        with self.lock:
+            return self.model(frame, verbose=False, **kwargs)
+
+    def detect(self, frame, **kwargs):
+        """Run inference and decode the boxes into detection dicts"""
+        results = self.predict(frame, **kwargs)
+        names = self.names
+        
+        # One conversion per result rather than per box
+        detections = []
+        for r in results:
+            boxes = r.boxes
+            if boxes is None or len(boxes) == 0:
+                continue
+            try:
+                for cls_id, conf, xyxy in zip(boxes.cls.tolist(), boxes.conf.tolist(), boxes.xyxy.tolist()):
+                    detections.append({
+                        'class': names[int(cls_id)],
+                        'confidence': conf,
+                        'box': xyxy
+                    })
+            except Exception as e:
+                logger.error(f"Error processing detection boxes: {str(e)}")
+                continue
+        return detections
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_model(path):
+    """Get the shared model for a path, loading it on first use"""
+    with _models_lock:
+        shared = _models.get(path)
+        if shared is None:
+            logger.info(f"Loading model from {path}")
+            shared = SharedModel(path)
+            _models[path] = shared
+            logger.info(f"Model {path} loaded successfully")
+        return shared
+
+
+def loaded_models():
+    """List the paths of all models currently loaded"""
+    with _models_lock:
+        return list(_models)
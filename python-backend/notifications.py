@@ -0,0 +1,218 @@
+import threading
+import time
+import logging
+import requests
+from datetime import datetime
+import config
+
+logger = logging.getLogger('notifications')
+
+# ntfy priority names and numbers by level, from lowest (1) to highest (5)
+PRIORITY_LEVELS = {
+    'min': 1, '1': 1,
+    'low': 2, '2': 2,
+    'default': 3, '3': 3,
+    'high': 4, '4': 4,
+    'urgent': 5, 'max': 5, '5': 5,
+}
+
+
+def priority_level(priority):
+    """Numeric level of an ntfy priority (case-insensitive), or None if it is not one"""
+    return PRIORITY_LEVELS.get(str(priority).strip().lower())
+
+
+def ntfy_url(topic):
+    """Full ntfy URL for a topic (a full URL is used as is)"""
+    if topic.startswith(("http://", "https://")):
+        return topic
+    base = config.NTFY_BASE_URL.rstrip("/")
+    return f"{base}/{topic.lstrip('/')}"
+
+
+def post_notification(topic, title, message, priority, tags):
+    """Send one notification using NTFY; returns True on success"""
+    try:
+        # Add timestamp to the message
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        message = f"[{timestamp}] {message}"
+
+        # Use only ASCII characters in headers to avoid encoding issues
+        headers = {
+            "Title": title,
+            "Priority": priority,
+            "Tags": tags,
+            "Content-Type": "text/plain; charset=utf-8"  # Ensure UTF-8 content type
+        }
+
+        # Ensure we're using utf-8 for the message body
+        response = requests.post(ntfy_url(topic), data=message.encode('utf-8'), headers=headers)
+
+        if response.status_code == 200:
+            logger.info(f"Notification sent: {title}")
+            return True
+        logger.error(f"Failed to send notification: {response.status_code} - {response.text}")
+        return False
+
+    except Exception as e:
+        logger.error(f"Error sending notification: {str(e)}")
+        # Log more details to help diagnose the issue
+        import traceback
+        logger.debug(f"Notification error details: {traceback.format_exc()}")
+        return False
+
+
+def pluralize(name, count):
+    if count == 1:
+        return name
+    if name.endswith(('s', 'sh', 'ch', 'x')):
+        return f"{name}es"
+    return f"{name}s"
+
+
+def format_digest(entries):
+    """Summarise pending entries, e.g. "2 persons, 3 cars on cam-4; 1 truck on cam-2" """
+    by_camera = {}
+    for (camera, object_class), entry in entries.items():
+        by_camera.setdefault(camera, []).append(f"{entry['count']} {pluralize(object_class, entry['count'])}")
+    parts = []
+    for camera, items in by_camera.items():
+        summary = ', '.join(items)
+        parts.append(f"{summary} on {camera}" if camera else summary)
+    return '; '.join(parts)
+
+
+class NotificationAggregator:
+    """Coalesces notifications per topic into one digest message.
+
+    Detections queued with `add` are merged for `window` seconds (per class and
+    camera, keeping the largest simultaneous count) and then sent as a single
+    message. Digests for a topic are at least `min_interval` seconds apart;
+    a digest that is due earlier keeps collecting until then. `send_now`
+    bypasses both for urgent alerts. Every queued or immediate notification
+    counts as one request that would otherwise have been sent.
+
+    Windows and rate limits run on wall-clock timers unless the caller passes
+    its own clock as `now` (replay media time). Such a topic's digest is then
+    sent from `tick`, so replays digest the same way at any speed.
+    """
+
+    def __init__(self, window, min_interval, sender=post_notification):
+        self.window = window
+        self.min_interval = min_interval
+        self.sender = sender
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_sent = {}
+        self.received = 0
+        self.sent = 0
+
+    def add(self, topic, camera, object_class, count, confidence, priority='default', now=None):
+        """Queue a detection for the topic's next digest"""
+        if self.window <= 0:
+            self.send_now(topic, *self.single_message(camera, object_class, count, confidence), priority, "warning",
+                          now=now)
+            return
+
+        with self.lock:
+            self.received += 1
+            digest = self.pending.get(topic)
+            if digest is None:
+                digest = {'entries': {}, 'priority': priority, 'timer': None, 'opened_at': now}
+                self.pending[topic] = digest
+                if now is None:
+                    self._schedule(topic, digest, self.window)
+            entry = digest['entries'].setdefault((camera, object_class), {'count': 0, 'confidence': 0.0})
+            entry['count'] = max(entry['count'], count)
+            entry['confidence'] = max(entry['confidence'], confidence)
+            # The highest priority wins; a value ntfy may know but we do not is passed through
+            level, current = priority_level(priority), priority_level(digest['priority'])
+            if level is None or current is None or level > current:
+                digest['priority'] = priority
+
+    def tick(self, topic, now):
+        """Send the topic's digest if its window has passed on the caller's clock"""
+        with self.lock:
+            digest = self.pending.get(topic)
+            if digest is None or digest['opened_at'] is None or now - digest['opened_at'] < self.window:
+                return
+        self.flush(topic, force=False, now=now)
+
+    def reset_clock(self, topic):
+        """Forget when the topic last sent, for a caller whose clock restarts (a new replay)"""
+        with self.lock:
+            self.last_sent.pop(topic, None)
+
+    def send_now(self, topic, title, message, priority, tags, now=None):
+        """Send a notification immediately, outside of any digest"""
+        with self.lock:
+            self.received += 1
+            self.sent += 1
+            self.last_sent[topic] = time.time() if now is None else now
+        return self.sender(topic, title, message, priority, tags)
+
+    def single_message(self, camera, object_class, count, confidence):
+        """Title and message for a digest that holds a single detection"""
+        where = f" on {camera}" if camera else ""
+        if count == 1:
+            return (f"Object Detected: {object_class}",
+                    f"Detected {object_class}{where} with {confidence:.2%} confidence")
+        return (f"Objects Detected: {object_class}",
+                f"Detected {count} {pluralize(object_class, count)}{where} with up to {confidence:.2%} confidence")
+
+    def _schedule(self, topic, digest, delay):
+        timer = threading.Timer(delay, self.flush, args=(topic, False))
+        timer.daemon = True
+        digest['timer'] = timer
+        timer.start()
+
+    def flush(self, topic=None, force=True, now=None):
+        """Send pending digests (all topics when topic is None)"""
+        topics = [topic] if topic is not None else None
+        with self.lock:
+            if topics is None:
+                topics = list(self.pending)
+            to_send = []
+            for name in topics:
+                digest = self.pending.get(name)
+                if digest is None:
+                    continue
+                current_time = time.time() if now is None else now
+                last_sent = self.last_sent.get(name)
+                wait = last_sent + self.min_interval - current_time if last_sent is not None else 0
+                if not force and wait > 0:
+                    # Rate limited: keep collecting until the topic may send again
+                    if digest['opened_at'] is None:
+                        self._schedule(name, digest, wait)
+                    continue
+                if digest['timer'] is not None:
+                    digest['timer'].cancel()
+                del self.pending[name]
+                self.sent += 1
+                self.last_sent[name] = current_time
+                to_send.append((name, digest))
+
+        # Network requests happen outside the lock
+        for name, digest in to_send:
+            entries = digest['entries']
+            if len(entries) == 1:
+                (camera, object_class), entry = next(iter(entries.items()))
+                title, message = self.single_message(camera, object_class, entry['count'], entry['confidence'])
+            else:
+                title = "Objects Detected"
+                message = f"Detected {format_digest(entries)}"
+            self.sender(name, title, message, digest['priority'], "warning")
+
+    def stats(self):
+        """Outbound request counters"""
+        with self.lock:
+            return {
+                'notifications': self.received,
+                'requests_sent': self.sent,
+                'requests_saved': self.received - self.sent,
+                'pending_topics': len(self.pending),
+            }
+
+
+# Shared by every camera so digests for the same topic merge across cameras
+aggregator = NotificationAggregator(config.NOTIFICATION_WINDOW, config.NOTIFICATION_MIN_INTERVAL)
@@ -0,0 +1,177 @@
+import cv2
+import math
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+import config
+
+logger = logging.getLogger('probing')
+
+# Shared pool so concurrent bulk probes cannot start an unbounded number of captures
+_executor = ThreadPoolExecutor(max_workers=config.PROBE_MAX_WORKERS, thread_name_prefix='probe')
+
+
+def open_capture(stream_url, timeout=None):
+    """Open a cv2.VideoCapture with open/read timeouts where the backend supports them"""
+    timeout_ms = int((timeout or config.CAPTURE_TIMEOUT) * 1000)
+    params = [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms,
+    ]
+    try:
+        cap = cv2.VideoCapture(stream_url, cv2.CAP_ANY, params)
+    except (TypeError, AttributeError, cv2.error):
+        # OpenCV builds without capture parameters
+        cap = cv2.VideoCapture(stream_url)
+    if cap.isOpened() and not isinstance(stream_url, int):
+        # Keep only the newest frame queued for live network streams
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def decode_fourcc(value):
+    """Turn a CAP_PROP_FOURCC value into its four-character codec name"""
+    value = int(value)
+    if value <= 0:
+        return None
+    codec = ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00 ')
+    return codec or None
+
+
+def probe_camera(stream_url, timeout=None):
+    """Open a stream, read one frame and report its metadata"""
+    result = {
+        'stream_url': stream_url,
+        'success': False,
+        'message': None,
+        'codec': None,
+        'width': None,
+        'height': None,
+        'fps': None,
+        'open_latency_ms': None,
+        'first_frame_latency_ms': None,
+        'probed_at': time.time(),
+    }
+    start_time = time.time()
+    cap = None
+    try:
+        cap = open_capture(stream_url, timeout)
+        result['open_latency_ms'] = (time.time() - start_time) * 1000
+        if not cap.isOpened():
+            result['message'] = f'Failed to connect to camera at {stream_url}'
+            return result
+
+        ret, frame = cap.read()
+        result['first_frame_latency_ms'] = (time.time() - start_time) * 1000
+        if not ret or frame is None:
+            result['message'] = 'Connected to camera but failed to read frame'
+            return result
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        result.update({
+            'success': True,
+            'message': 'Camera connection successful',
+            'codec': decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+            'height': int(frame.shape[0]),
+            'width': int(frame.shape[1]),
+            'fps': fps if fps and fps > 0 else None,
+        })
+        return result
+    except Exception as e:
+        logger.error(f"Error probing camera {stream_url}: {str(e)}")
+        result['message'] = f"Error: {str(e)}"
+        return result
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+class ProbeCache:
+    """Successful probe results by stream URL, kept for config.PROBE_CACHE_TTL seconds"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.results = {}
+
+    def get(self, stream_url):
+        with self.lock:
+            result = self.results.get(stream_url)
+        if result is None or time.time() - result['probed_at'] > self.ttl:
+            return None
+        return result
+
+    def put(self, result):
+        """Store a successful result; a failed probe invalidates the entry instead"""
+        with self.lock:
+            if result.get('success'):
+                self.results[result['stream_url']] = result
+            else:
+                self.results.pop(result['stream_url'], None)
+
+
+probe_cache = ProbeCache(config.PROBE_CACHE_TTL)
+
+
+def probe_cameras(stream_urls, timeout=None, use_cache=True):
+    """Probe many streams concurrently, each under its own deadline.
+
+    The deadline of a probe counts from when a worker picks it up, so probes
+    queued behind a full pool are not penalised. The whole call is bounded by
+    an overall deadline of one extra round for queue wait plus one round per
+    PROBE_MAX_WORKERS probes; probes that have not finished by then, including
+    ones still queued behind stuck workers, are reported as timed out. Returns
+    results in the same order as stream_urls. A timed-out probe's result is
+    still cached once OpenCV gives up on it.
+    """
+    timeout = timeout or config.PROBE_TIMEOUT
+    results = {}
+    started = {}
+    pending = {}
+
+    def timed_out(stream_url, message, now):
+        return {
+            'stream_url': stream_url,
+            'success': False,
+            'message': message,
+            'probed_at': now,
+        }
+
+    def run_probe(stream_url):
+        started[stream_url] = time.time()
+        return probe_camera(stream_url, timeout)
+
+    for stream_url in dict.fromkeys(stream_urls):
+        cached = probe_cache.get(stream_url) if use_cache else None
+        if cached is not None:
+            results[stream_url] = dict(cached, cached=True)
+        else:
+            pending[_executor.submit(run_probe, stream_url)] = stream_url
+
+    rounds = math.ceil(len(pending) / config.PROBE_MAX_WORKERS) + 1
+    deadline = time.time() + timeout * rounds
+
+    while pending:
+        done, _ = wait(pending, timeout=0.1)
+        now = time.time()
+        for future in list(pending):
+            stream_url = pending[future]
+            if future in done:
+                result = future.result()
+                probe_cache.put(result)
+            elif stream_url not in started and now > deadline:
+                # Still queued behind workers held by probes that never returned
+                future.cancel()
+                result = timed_out(stream_url, 'Camera probe did not start before the request deadline', now)
+            elif stream_url in started and (now - started[stream_url] > timeout or now > deadline):
+                # Record the result whenever the probe eventually finishes
+                future.add_done_callback(lambda f: probe_cache.put(f.result()))
+                result = timed_out(stream_url, f'Camera probe timed out after {timeout:.1f}s', now)
+            else:
+                continue
+            results[stream_url] = dict(result, cached=False)
+            del pending[future]
+
+    # One copy per input, since several inputs may normalise to the same stream URL
+    return [dict(results[stream_url]) for stream_url in stream_urls]
@@ -0,0 +1,180 @@
+import io
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import zipfile
+from collections import Counter
+import logging
+
+logger = logging.getLogger('profiler')
+
+# Only one profile may run at a time
+_profile_lock = threading.Lock()
+
+
+def thread_cpu_times():
+    """CPU seconds consumed so far by each live thread, keyed by thread ident"""
+    times = {}
+    for thread in threading.enumerate():
+        try:
+            clock_id = time.pthread_getcpuclockid(thread.ident)
+            times[thread.ident] = (thread.name, time.clock_gettime(clock_id))
+        except (AttributeError, OSError, TypeError):
+            # Per-thread CPU clocks are not available on this platform
+            continue
+    return times
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads at a fixed interval.
+
+    Sampling only reads `sys._current_frames()`, so the profiled threads are
+    never instrumented or slowed down beyond the sampler's own GIL time.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self.elapsed = 0.0
+
+    def run(self, duration):
+        """Sample for the given number of seconds"""
+        own_ident = threading.get_ident()
+        names = {}
+        start_time = time.time()
+        end_time = start_time + duration
+        while time.time() < end_time:
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+            self.sample_count += 1
+            time.sleep(self.interval)
+        self.elapsed = time.time() - start_time
+
+    def collapsed(self):
+        """Samples in collapsed-stack format (flamegraph.pl / speedscope)"""
+        lines = []
+        for (thread_name, stack), count in sorted(self.samples.items(), key=lambda item: -item[1]):
+            frames = [f"{name} ({os.path.basename(filename)}:{line})" for filename, line, name in stack]
+            lines.append(f"{';'.join([thread_name] + frames)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def pstats_data(self):
+        """Samples as a marshalled stats table loadable with pstats.Stats(path).
+
+        Call counts are sample counts. Each sample stands for the wall-clock time
+        between samples (elapsed / sample count), which is longer than the
+        nominal interval by the time spent taking the sample and oversleeping.
+        """
+        stats = {}
+        sample_seconds = self.elapsed / self.sample_count if self.sample_count else 0.0
+        for (_, stack), count in self.samples.items():
+            seconds = count * sample_seconds
+            seen = set()
+            for i, key in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.get(key, (0, 0, 0.0, 0.0, {}))
+                leaf = i == len(stack) - 1
+                if leaf:
+                    tt += seconds
+                if key not in seen:
+                    # Recursive frames only count once towards inclusive time
+                    cc, nc, ct = cc + count, nc + count, ct + seconds
+                    seen.add(key)
+                if i > 0:
+                    caller = stack[i - 1]
+                    c_cc, c_nc, c_tt, c_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (c_cc + count, c_nc + count, c_tt + (seconds if leaf else 0.0), c_ct + seconds)
+                stats[key] = (cc, nc, tt, ct, callers)
+        return marshal.dumps(stats)
+
+
+def top_allocations(snapshot, limit):
+    """Largest allocation sites of a tracemalloc snapshot"""
+    return [{
+        'file': stat.traceback[0].filename,
+        'line': stat.traceback[0].lineno,
+        'size_kb': stat.size / 1024,
+        'count': stat.count,
+    } for stat in snapshot.statistics('lineno')[:limit]]
+
+
+def run_profile(duration, interval=0.01, output_format='collapsed', top=20, allocations=False):
+    """Profile the running process and return (filename, zip bytes), or None if one is already running.
+
+    The archive holds the stack samples (`profile.collapsed` or `profile.pstats`)
+    and `summary.json` with per-thread CPU time over the window. With
+    `allocations`, tracemalloc runs for the window and the summary also lists
+    the top allocation sites; tracing slows every allocation in the process,
+    so it is opt-in.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        started_tracemalloc = allocations and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            # One frame per traceback keeps tracing overhead low under load
+            tracemalloc.start(1)
+
+        logger.info(f"Profiling for {duration}s at {interval * 1000:.0f}ms intervals")
+        start_time = time.time()
+        start_process_cpu = time.process_time()
+        start_cpu = thread_cpu_times()
+
+        profiler = SamplingProfiler(interval)
+        profiler.run(duration)
+
+        end_cpu = thread_cpu_times()
+        elapsed = time.time() - start_time
+        snapshot = tracemalloc.take_snapshot() if allocations else None
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+        threads = []
+        for ident, (name, cpu) in end_cpu.items():
+            cpu_seconds = cpu - start_cpu.get(ident, (name, 0.0))[1]
+            threads.append({
+                'ident': ident,
+                'name': name,
+                'cpu_seconds': cpu_seconds,
+                'cpu_percent': cpu_seconds * 100 / elapsed if elapsed else None,
+            })
+        threads.sort(key=lambda thread: -thread['cpu_seconds'])
+
+        summary = {
+            'started_at': start_time,
+            'duration': elapsed,
+            'interval': interval,
+            'samples': profiler.sample_count,
+            'process_cpu_seconds': time.process_time() - start_process_cpu,
+            'threads': threads,
+        }
+        if snapshot is not None:
+            summary['tracemalloc_window_only'] = started_tracemalloc
+            summary['top_allocations'] = top_allocations(snapshot, top)
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            if output_format == 'pstats':
+                zf.writestr('profile.pstats', profiler.pstats_data())
+            else:
+                zf.writestr('profile.collapsed', profiler.collapsed())
+            zf.writestr('summary.json', json.dumps(summary, indent=2))
+
+        logger.info(f"Profile finished: {profiler.sample_count} samples in {elapsed:.1f}s")
+        return f"profile-{int(start_time)}.zip", archive.getvalue()
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,137 @@
+import config
+
+# Start settings that override individual fields of the selected profile
+PROFILE_OVERRIDES = {
+    'modelVariant': 'model',
+    'inputSize': 'input_size',
+    'confidenceThreshold': 'confidence',
+    'iouThreshold': 'iou',
+    'classes': 'classes',
+    'cascade': 'cascade',
+}
+
+
+def check_variant(variant):
+    """Return the variant if it is a key of MODEL_VARIANTS, raise ValueError otherwise"""
+    if not isinstance(variant, str) or variant not in config.MODEL_VARIANTS:
+        raise ValueError(f"Unknown model variant {variant!r}. Available variants: {', '.join(config.MODEL_VARIANTS)}")
+    return variant
+
+
+def check_class_list(classes, field):
+    """Return a list of class names, raise ValueError unless it is a list of strings (or empty)"""
+    if not classes:
+        return []
+    if not isinstance(classes, list) or not all(isinstance(name, str) for name in classes):
+        raise ValueError(f"{field} must be a list of class names, got {classes!r}")
+    return list(classes)
+
+
+class DetectionProfile:
+    """Model variant, input size, thresholds, class allow-list and optional cascade used by one camera"""
+
+    def __init__(self, name, model='m', input_size=None, confidence=None, iou=None, classes=None,
+                 cascade=None):
+        self.name = name
+        # Only operator-configured model files may be loaded, never a client-supplied path
+        self.model = check_variant(model)
+        self.input_size = int(config.INPUT_SIZE if input_size is None else input_size)
+        self.confidence = float(config.CONFIDENCE_THRESHOLD if confidence is None else confidence)
+        self.iou = float(config.IOU_THRESHOLD if iou is None else iou)
+        self.classes = check_class_list(classes, 'classes') or None
+
+        if not 0 <= self.confidence <= 1:
+            raise ValueError(f"Confidence threshold must be between 0 and 1, got {self.confidence}")
+        if not 0 <= self.iou <= 1:
+            raise ValueError(f"IoU threshold must be between 0 and 1, got {self.iou}")
+        if self.input_size <= 0 or self.input_size % 32:
+            raise ValueError(f"Input size must be a positive multiple of 32, got {self.input_size}")
+
+        # A cascade screens frames with a smaller model; `model` then only verifies escalations
+        self.cascade = None
+        if cascade:
+            self.cascade = {
+                'screener': 'n',
+                'input_size': self.input_size,
+                'escalate_low': config.CASCADE_ESCALATE_LOW,
+                'escalate_high': config.CASCADE_ESCALATE_HIGH,
+                'escalate_classes': [],
+                'audit_interval': config.CASCADE_AUDIT_INTERVAL,
+            }
+            if isinstance(cascade, dict):
+                unknown = set(cascade) - set(self.cascade)
+                if unknown:
+                    raise ValueError(f"Unknown cascade settings: {', '.join(sorted(unknown))}")
+                self.cascade.update(cascade)
+            elif cascade is not True:
+                raise ValueError(f"Cascade must be true or an object, got {cascade!r}")
+            self.cascade.update({
+                'screener': check_variant(self.cascade['screener']),
+                'input_size': int(self.cascade['input_size']),
+                'escalate_low': float(self.cascade['escalate_low']),
+                'escalate_high': float(self.cascade['escalate_high']),
+                'escalate_classes': check_class_list(self.cascade['escalate_classes'], 'escalate_classes'),
+                'audit_interval': int(self.cascade['audit_interval']),
+            })
+            low, high = self.cascade['escalate_low'], self.cascade['escalate_high']
+            if not 0 <= low <= high <= 1:
+                raise ValueError(f"Cascade escalation band must satisfy 0 <= low <= high <= 1, got [{low}, {high})")
+            if low > self.confidence:
+                # The screener runs at escalate_low, so candidates below it are dropped without verification
+                raise ValueError(f"Cascade escalate_low ({low}) must not exceed the confidence threshold "
+                                 f"({self.confidence})")
+            if self.cascade['input_size'] <= 0 or self.cascade['input_size'] % 32:
+                raise ValueError(f"Screener input size must be a positive multiple of 32, "
+                                 f"got {self.cascade['input_size']}")
+
+    @property
+    def model_path(self):
+        """Model file configured for the variant"""
+        return config.MODEL_VARIANTS[self.model]
+
+    @property
+    def screener_model_path(self):
+        """Model file of the cascade's screener, or None without a cascade"""
+        if not self.cascade:
+            return None
+        return config.MODEL_VARIANTS[self.cascade['screener']]
+
+    def inference_kwargs(self, shared_model, input_size=None):
+        """Keyword arguments for YOLO inference, with class filtering pushed into NMS"""
+        kwargs = {
+            'conf': self.confidence,
+            'iou': self.iou,
+            'imgsz': int(input_size or self.input_size),
+        }
+        if self.classes:
+            class_ids = shared_model.class_ids(self.classes)
+            if not class_ids:
+                raise ValueError(f"None of the classes {self.classes} are known to model {shared_model.path}")
+            kwargs['classes'] = class_ids
+        return kwargs
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'model': self.model,
+            'model_path': self.model_path,
+            'input_size': self.input_size,
+            'confidence': self.confidence,
+            'iou': self.iou,
+            'classes': self.classes,
+            'cascade': self.cascade,
+        }
+
+
+def resolve_profile(settings):
+    """Build the detection profile for a session from its start settings"""
+    name = settings.get('detectionProfile') or 'default'
+    if name not in config.DETECTION_PROFILES:
+        raise ValueError(f"Unknown detection profile: {name}")
+
+    fields = dict(config.DETECTION_PROFILES[name])
+    for setting, field in PROFILE_OVERRIDES.items():
+        if settings.get(setting) is not None:
+            fields[field] = settings[setting]
+
+    return DetectionProfile(name, **fields)
@@ -0,0 +1,112 @@
+import cv2
+import os
+import time
+import logging
+import config
+
+logger = logging.getLogger('replay')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class ReplayCapture:
+    """Drop-in for cv2.VideoCapture that replays a recorded video file or frame directory.
+
+    In real-time mode it behaves like a live camera: reads return the frame due
+    at the current wall-clock time and frames the reader was too slow for are
+    skipped. In maximum-speed mode every frame is returned in order, which makes
+    runs deterministic. Once the recording is exhausted `finished` is set.
+    """
+
+    def __init__(self, source, realtime=True, fps=None):
+        self.source = source
+        self.realtime = realtime
+        self.finished = False
+        self.index = -1  # Index of the last frame returned
+        self.position = 0  # Index of the next frame the video decoder will produce
+        self.start_time = None
+        self.files = None
+        self.video = None
+
+        if os.path.isdir(source):
+            self.files = sorted(
+                os.path.join(source, name) for name in os.listdir(source)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            self.fps = float(fps or config.REPLAY_FPS)
+        else:
+            self.video = cv2.VideoCapture(source)
+            self.fps = float(fps or self.video.get(cv2.CAP_PROP_FPS) or config.REPLAY_FPS)
+
+        logger.info(f"Replaying {source} at {self.fps:.1f} fps ({'real-time' if realtime else 'maximum speed'})")
+
+    def isOpened(self):
+        if self.files is not None:
+            return len(self.files) > 0
+        return self.video is not None and self.video.isOpened()
+
+    def media_time(self):
+        """Position of the last returned frame in the recording, in seconds"""
+        return max(self.index, 0) / self.fps
+
+    def read(self, image=None):
+        """Read the next frame, returning (ret, frame) like cv2.VideoCapture"""
+        if self.finished or not self.isOpened():
+            return False, None
+
+        if self.start_time is None:
+            self.start_time = time.time()
+
+        target = self.index + 1
+        if self.realtime:
+            elapsed = time.time() - self.start_time
+            due = int(elapsed * self.fps)
+            if due < target:
+                # Too early for the next frame: wait for it like a live stream would
+                time.sleep(target / self.fps - elapsed)
+            else:
+                target = due
+
+        frame = self._read_frame(target, image)
+        if frame is None:
+            logger.info(f"Replay of {self.source} finished after {self.index + 1} frames")
+            self.finished = True
+            return False, None
+
+        self.index = target
+        return True, frame
+
+    def _read_frame(self, target, image):
+        if self.files is not None:
+            if target >= len(self.files):
+                return None
+            return cv2.imread(self.files[target])
+
+        # Skip frames without decoding them into images
+        while self.position < target:
+            if not self.video.grab():
+                return None
+            self.position += 1
+
+        ret, frame = self.video.read(image) if image is not None else self.video.read()
+        if not ret:
+            return None
+        self.position += 1
+        return frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            if self.files is not None:
+                return len(self.files)
+            return self.video.get(prop)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.index + 1
+        return self.video.get(prop) if self.video is not None else 0
+
+    def release(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+        self.files = None
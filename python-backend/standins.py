@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+logger = logging.getLogger('standins')
+
+
+class StandinServer:
+    """Local stand-in for the ntfy and Supabase REST endpoints used by the detector.
+
+    `POST /rest/v1/<table>` inserts rows (requires an `apikey` header) and
+    `GET /rest/v1/<table>` lists them. Any other `POST /<topic>` is recorded as
+    an ntfy message, and `GET /<topic>/json` returns the topic's messages as
+    newline-delimited JSON like ntfy's poll API.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.lock = threading.Lock()
+        self.notifications = []
+        self.rows = {}
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def ntfy_url(self, topic):
+        """Full URL for an ntfy topic, usable as the `ntfyTopic` setting"""
+        return f"{self.url}/{topic}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        logger.info(f"Stand-in ntfy/Supabase server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset(self):
+        """Forget all recorded notifications and rows"""
+        with self.lock:
+            self.notifications = []
+            self.rows = {}
+
+    def get_notifications(self, topic=None):
+        with self.lock:
+            return [n for n in self.notifications if topic is None or n['topic'] == topic]
+
+    def get_rows(self, table):
+        with self.lock:
+            return list(self.rows.get(table, []))
+
+    def _make_handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+
+            def _send_json(self, status, payload, ndjson=False):
+                if ndjson:
+                    body = ''.join(json.dumps(item) + '\n' for item in payload).encode('utf-8')
+                else:
+                    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/x-ndjson' if ndjson else 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                path = urlparse(self.path).path.strip('/')
+                body = self._read_body()
+
+                if path.startswith('rest/v1/'):
+                    if not self.headers.get('apikey'):
+                        self._send_json(401, {'message': 'No API key found in request'})
+                        return
+                    try:
+                        payload = json.loads(body or b'null')
+                    except ValueError:
+                        self._send_json(400, {'message': 'Invalid JSON body'})
+                        return
+                    rows = payload if isinstance(payload, list) else [payload]
+                    with standin.lock:
+                        standin.rows.setdefault(path[len('rest/v1/'):], []).extend(rows)
+                    if 'return=minimal' in (self.headers.get('Prefer') or ''):
+                        self._send_json(201, None)
+                    else:
+                        self._send_json(201, rows)
+                    return
+
+                if not path:
+                    self._send_json(404, {'error': 'topic required'})
+                    return
+                message = {
+                    'id': f"standin-{len(standin.notifications) + 1}",
+                    'time': int(time.time()),
+                    'event': 'message',
+                    'topic': path,
+                    'title': self.headers.get('Title'),
+                    'priority': self.headers.get('Priority'),
+                    'tags': self.headers.get('Tags'),
+                    'message': body.decode('utf-8', errors='replace'),
+                }
+                with standin.lock:
+                    standin.notifications.append(message)
+                self._send_json(200, message)
+
+            def do_GET(self):
+                path = urlparse(self.path).path.strip('/')
+                if path.startswith('rest/v1/'):
+                    self._send_json(200, standin.get_rows(path[len('rest/v1/'):]))
+                elif path.endswith('/json'):
+                    self._send_json(200, standin.get_notifications(path[:-len('/json')]), ndjson=True)
+                else:
+                    self._send_json(404, {'error': 'not found'})
+
+        return Handler
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Run local ntfy and Supabase stand-in endpoints')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+
+    server = StandinServer(args.host, args.port)
+    logger.info(f"Use NTFY_BASE_URL={server.url} and supabaseUrl={server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
@@ -0,0 +1,154 @@
+import cv2
+import threading
+import time
+import logging
+
+logger = logging.getLogger('streaming')
+
+
+class EncodedFrame:
+    """A JPEG encoding of one published frame for one stream profile"""
+
+    def __init__(self, data, version, etag):
+        self.data = data
+        self.version = version
+        self.etag = etag
+        self.created_at = time.time()
+
+
+class StreamHub:
+    """Latest annotated frame plus its per-profile JPEG encodings.
+
+    Each profile is encoded at most once per published frame and the result is
+    shared by every viewer (MJPEG streams and snapshot pollers alike). Open
+    streams and snapshot requests from the last `snapshot_ttl` seconds both
+    count as demand for a profile's output size.
+    """
+
+    def __init__(self, profiles, on_max_dim_change=None, snapshot_ttl=30.0):
+        self.profiles = profiles
+        self.on_max_dim_change = on_max_dim_change
+        self.snapshot_ttl = snapshot_ttl
+        self.condition = threading.Condition()
+        self.frame = None
+        self.rendered_dim = None  # Preview size the current frame was rendered for
+        self.version = 0
+        # Distinguishes ETags across process restarts, since versions restart at 0
+        self.epoch = f"{int(time.time() * 1000):x}"
+        self.encoded = {}
+        self.encode_locks = {name: threading.Lock() for name in profiles}
+        self.encode_counts = {name: 0 for name in profiles}
+        self.viewers = {name: 0 for name in profiles}
+        self.snapshot_requests = {}  # Profile name -> time of its last snapshot request
+
+    def publish(self, frame, rendered_dim=None):
+        """Publish a new (read-only) frame and invalidate previous encodings"""
+        with self.condition:
+            self.frame = frame
+            self.rendered_dim = rendered_dim
+            self.version += 1
+            self.encoded = {}
+            now = time.time()
+            expired = [name for name, requested_at in self.snapshot_requests.items()
+                       if now - requested_at > self.snapshot_ttl]
+            for name in expired:
+                del self.snapshot_requests[name]
+            self.condition.notify_all()
+        if expired:
+            # Stop rendering large previews nobody has asked for recently
+            self._notify_max_dim()
+
+    def clear(self):
+        """Drop the current frame"""
+        self.publish(None)
+
+    def wait_for_frame(self, last_version, timeout):
+        """Wait until a frame newer than last_version is published; return the current version"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != last_version, timeout=timeout)
+            return self.version
+
+    def get_encoded(self, profile_name):
+        """Get the JPEG for the current frame in the given profile, encoding it if needed"""
+        with self.encode_locks[profile_name]:
+            with self.condition:
+                frame, version = self.frame, self.version
+                cached = self.encoded.get(profile_name)
+            if cached is not None and cached.version == version:
+                return cached
+            if frame is None:
+                return None
+
+            encoded = EncodedFrame(self._encode(frame, self.profiles[profile_name]), version,
+                                   f"{self.epoch}-{version}-{profile_name}")
+            with self.condition:
+                self.encode_counts[profile_name] += 1
+                if self.version == version:
+                    self.encoded[profile_name] = encoded
+            return encoded
+
+    def _encode(self, frame, profile):
+        """Resize the frame to the profile's size and encode it to JPEG"""
+        h, w = frame.shape[:2]
+        max_dim = profile.get('max_dim')
+        if max_dim and max(h, w) > max_dim:
+            scale = max_dim / max(h, w)
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), profile['quality']]
+        _, buffer = cv2.imencode('.jpg', frame, encode_params)
+        return buffer.tobytes()
+
+    def request_snapshot(self, profile_name, timeout):
+        """Record a snapshot request as demand for the profile's size.
+
+        When the demand raises the preview size, waits up to `timeout` seconds
+        for a frame rendered at the new size.
+        """
+        with self.condition:
+            new_demand = profile_name not in self.snapshot_requests
+            self.snapshot_requests[profile_name] = time.time()
+        if not new_demand:
+            return
+        self._notify_max_dim()
+
+        max_dim = self.profiles[profile_name]['max_dim']
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.frame is None or self.rendered_dim is None or self.rendered_dim >= max_dim,
+                timeout=timeout)
+
+    def add_viewer(self, profile_name):
+        """Register a viewer of a stream profile"""
+        with self.condition:
+            self.viewers[profile_name] += 1
+        self._notify_max_dim()
+
+    def remove_viewer(self, profile_name):
+        """Unregister a viewer of a stream profile"""
+        with self.condition:
+            self.viewers[profile_name] = max(0, self.viewers[profile_name] - 1)
+        self._notify_max_dim()
+
+    def required_max_dim(self):
+        """Largest output size of a profile with viewers or recent snapshot requests"""
+        with self.condition:
+            dims = [self.profiles[name]['max_dim'] for name, count in self.viewers.items() if count]
+            dims += [self.profiles[name]['max_dim'] for name in self.snapshot_requests]
+        return max(dims) if dims else None
+
+    def _notify_max_dim(self):
+        if self.on_max_dim_change:
+            try:
+                self.on_max_dim_change(self.required_max_dim())
+            except Exception as e:
+                logger.exception(f"Error updating preview size: {str(e)}")
+
+    def stats(self):
+        """Viewer and encode counters per profile"""
+        with self.condition:
+            return {
+                'frame_version': self.version,
+                'viewers': dict(self.viewers),
+                'snapshot_demand': sorted(self.snapshot_requests),
+                'encodes': dict(self.encode_counts),
+            }